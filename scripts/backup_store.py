@@ -0,0 +1,251 @@
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+
+# 备份目录结构：
+#   backup/objects/<哈希前两位>/<哈希>   文件内容，按 sha256 去重
+#   backup/imports/<导入ID>.json        每次导入的清单：相对路径 -> 哈希
+OBJECTS_DIR = "objects"
+IMPORTS_DIR = "imports"
+# 小于该大小的文件在内存中计算哈希，已有相同内容时完全不写磁盘
+BLOB_BUFFER_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# 清理时保留最近修改过的未引用对象：进行中的导入已写入或复用的对象，要等清单保存后才被引用
+GC_GRACE_SECONDS = 3600
+
+class BackupError(Exception):
+    """备份不存在或已损坏"""
+
+class BlobWriter:
+    """边写边计算哈希，提交时按哈希存入对象目录，已存在相同内容则丢弃"""
+    def __init__(self, store):
+        self.store = store
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.buffer = io.BytesIO()
+        self.spill = None
+
+    def write(self, chunk):
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+        if self.spill is None and self.size > BLOB_BUFFER_BYTES:
+            # 大文件写入临时文件，避免占用过多内存
+            fd, path = tempfile.mkstemp(dir=self.store.objects_dir, suffix=".tmp")
+            self.spill = (os.fdopen(fd, "wb"), path)
+            self.spill[0].write(self.buffer.getvalue())
+            self.buffer = None
+        if self.spill is not None:
+            self.spill[0].write(chunk)
+        else:
+            self.buffer.write(chunk)
+
+    def close(self):
+        if self.spill is not None:
+            self.spill[0].close()
+
+    def commit(self):
+        """写入对象目录并返回内容哈希；多个线程同时提交相同内容时结果相同"""
+        self.close()
+        digest = self.hasher.hexdigest()
+        blob_path = self.store.blob_path(digest)
+        try:
+            # 复用已有对象时更新修改时间，避免在清单保存前被清理
+            os.utime(blob_path)
+            self.discard()
+            return digest
+        except FileNotFoundError:
+            pass
+        if self.spill is None:
+            # 每次提交使用独立的临时文件，并发导入相同内容时不会互相覆盖
+            fd, path = tempfile.mkstemp(dir=self.store.objects_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.buffer.getvalue())
+            self.spill = (f, path)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.replace(self.spill[1], blob_path)
+        except OSError:
+            # 其他线程已写入相同内容（Windows 上替换正在被读取的文件会失败）
+            if not os.path.exists(blob_path):
+                raise
+            self.discard()
+        return digest
+
+    def discard(self):
+        self.close()
+        if self.spill is not None and os.path.exists(self.spill[1]):
+            os.remove(self.spill[1])
+
+class BackupStore:
+    """按内容寻址、去重的导入备份"""
+    def __init__(self, backup_root):
+        self.backup_root = backup_root
+        self.objects_dir = os.path.join(backup_root, OBJECTS_DIR)
+        self.imports_dir = os.path.join(backup_root, IMPORTS_DIR)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.imports_dir, exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def blob_writer(self):
+        return BlobWriter(self)
+
+    def manifest_path(self, import_id):
+        return os.path.join(self.imports_dir, f"{import_id}.json")
+
+    def save_import(self, import_id, article_dir, files, source=None):
+        """保存一次导入的清单，files 为 {相对路径: {'hash', 'size'}}"""
+        manifest = {
+            "id": import_id,
+            "created": time.time(),
+            "article_dir": article_dir.replace("\\", "/"),
+            "source": source,
+            "files": files,
+        }
+        path = self.manifest_path(import_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        return manifest
+
+    def load_import(self, import_id):
+        try:
+            with open(self.manifest_path(import_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise BackupError(f"备份不存在: {import_id}")
+        except ValueError:
+            raise BackupError(f"备份清单已损坏: {import_id}")
+
+    def list_imports(self):
+        """按时间从新到旧返回所有导入清单"""
+        manifests = []
+        for name in os.listdir(self.imports_dir):
+            if name.endswith(".json"):
+                try:
+                    manifests.append(self.load_import(name[:-len(".json")]))
+                except BackupError:
+                    continue
+        return sorted(manifests, key=lambda manifest: manifest["created"], reverse=True)
+
+    def restore(self, import_id, target_dir, overwrite=False):
+        """根据清单重建文章目录，逐个校验内容哈希"""
+        manifest = self.load_import(import_id)
+        if os.path.exists(target_dir) and os.listdir(target_dir) and not overwrite:
+            raise BackupError(f"目标目录已存在且不为空: {target_dir}")
+        for rel_path, entry in sorted(manifest["files"].items()):
+            blob_path = self.blob_path(entry["hash"])
+            target = os.path.join(target_dir, rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            hasher = hashlib.sha256()
+            try:
+                with open(blob_path, "rb") as src, open(target, "wb") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        hasher.update(chunk)
+                        dst.write(chunk)
+            except FileNotFoundError:
+                raise BackupError(f"备份对象缺失: {rel_path} ({entry['hash']})")
+            if hasher.hexdigest() != entry["hash"]:
+                raise BackupError(f"备份对象已损坏: {rel_path} ({entry['hash']})")
+        return manifest
+
+    def gc(self, keep_last=None, keep_days=None, grace_seconds=GC_GRACE_SECONDS):
+        """按保留策略删除旧的导入清单，并清理不再被引用的对象
+
+        满足任一保留规则（最近 N 次 / 最近 N 天）的导入会被保留；两个规则都未指定时不删除清单。
+        最近 grace_seconds 秒内修改过的对象和目录可能属于进行中的导入，即使未被引用也不删除。
+        """
+        manifests = self.list_imports()
+        removed_imports = []
+        if keep_last is not None or keep_days is not None:
+            cutoff = time.time() - keep_days * 86400 if keep_days is not None else None
+            for index, manifest in enumerate(manifests):
+                keep = (keep_last is not None and index < keep_last) or (
+                    cutoff is not None and manifest["created"] >= cutoff
+                )
+                if not keep:
+                    os.remove(self.manifest_path(manifest["id"]))
+                    removed_imports.append(manifest["id"])
+        kept = [manifest for manifest in manifests if manifest["id"] not in removed_imports]
+        grace_cutoff = time.time() - grace_seconds
+
+        referenced = {entry["hash"] for manifest in kept for entry in manifest["files"].values()}
+        removed_blobs = 0
+        freed_bytes = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir, topdown=False):
+            # 删除文件会更新目录的修改时间，先记录
+            dir_mtime = os.path.getmtime(dirpath)
+            for filename in filenames:
+                # 正在写入的临时文件可能属于进行中的导入，不清理
+                if filename in referenced or filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                stat_result = os.stat(path)
+                if stat_result.st_mtime >= grace_cutoff:
+                    continue
+                freed_bytes += stat_result.st_size
+                os.remove(path)
+                removed_blobs += 1
+            if (dirpath != self.objects_dir and not os.listdir(dirpath)
+                    and dir_mtime < grace_cutoff):
+                os.rmdir(dirpath)
+        return {
+            "removed_imports": removed_imports,
+            "removed_blobs": removed_blobs,
+            "freed_bytes": freed_bytes,
+        }
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="文章导入备份管理")
+    parser.add_argument("--root", default=".", help="项目根目录（默认为当前目录）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="列出所有导入备份")
+
+    gc_parser = subparsers.add_parser("gc", help="按保留策略清理旧备份")
+    gc_parser.add_argument("--keep-last", type=int, help="保留最近 N 次导入")
+    gc_parser.add_argument("--keep-days", type=float, help="保留最近 N 天内的导入")
+
+    restore_parser = subparsers.add_parser("restore", help="从备份重建文章目录")
+    restore_parser.add_argument("import_id", help="导入ID（见 list 命令）")
+    restore_parser.add_argument("--target", help="恢复到指定目录（默认恢复到原文章目录）")
+    restore_parser.add_argument("--force", action="store_true", help="目标目录不为空时仍然写入")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = BackupStore(os.path.join(args.root, "backup"))
+    try:
+        if args.command == "list":
+            for manifest in store.list_imports():
+                size = sum(entry["size"] for entry in manifest["files"].values())
+                print(f"{manifest['id']}  {format_time(manifest['created'])}  "
+                      f"{len(manifest['files'])} files  {size} bytes  {manifest['article_dir']}")
+        elif args.command == "gc":
+            result = store.gc(args.keep_last, args.keep_days)
+            print(f"Removed {len(result['removed_imports'])} import(s), "
+                  f"{result['removed_blobs']} object(s), freed {result['freed_bytes']} bytes")
+        elif args.command == "restore":
+            manifest = store.load_import(args.import_id)
+            target = args.target or os.path.join(args.root, manifest["article_dir"])
+            store.restore(args.import_id, target, args.force)
+            print(f"Restored {len(manifest['files'])} file(s) to {target}")
+    except BackupError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+import contextlib
+from pathlib import Path
+
+import process_build
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时生成随机字节的"图片"，只能用于复制测试
+    Image = None
+
+# 生成语料用的素材
+CJK_TEXT = (
+    '宿星茶会的新版博客已经上线，本文记录了这次重构的全部过程。'
+    '我们把文章内容按照年份整理，并且为每个资源都附上了下载地址。'
+    '如果链接失效，请在评论区留言，我们会尽快补档。'
+    '这一段文字主要用来模拟真实文章中的长段落，没有任何英文句号'
+)
+LATIN_WORDS = ['release', 'patch', 'archive', 'mirror', 'download', 'version', 'update', 'notes']
+TAGS = ['游戏', '资源', '教程', '随笔', 'Galgame', '工具', '音乐', '动画']
+CATEGORIES = ['资源分享', '技术', '生活']
+
+# 病态输入：旧的正则实现在这些输入上是平方级复杂度，每项都有允许的最长耗时（秒）
+PATHOLOGICAL_CASES = {
+    'unclosed_brackets': ('[' * 50000, 0.5),
+    'bracket_link_prefixes': ('[a](' * 20000, 0.5),
+    'empty_links': (']' + '[](' * 20000, 0.5),
+    'long_cjk_line': ('中' * 100000, 0.5),
+    'long_line_without_dots': ('x' * 100000 + 'https://', 0.5),
+    'many_words_no_url': (('a' * 50 + ' ') * 2000, 0.5),
+}
+
+def random_url(rng: random.Random) -> str:
+    """生成一个随机的下载链接"""
+    host = rng.choice(['pan.baidu.com/s/', 'www.123pan.com/s/', 'drive.google.com/file/d/', 'mega.nz/file/'])
+    return 'https://' + host + ''.join(rng.choices('abcdefghijkmnpqrstuvwxyzABCDEFGH0123456789', k=rng.randint(8, 24)))
+
+def random_magnet(rng: random.Random) -> str:
+    """生成一个随机的磁力链接"""
+    return 'magnet:?xt=urn:btih:' + ''.join(rng.choices('0123456789abcdef', k=40))
+
+def random_code(rng: random.Random) -> str:
+    return ''.join(rng.choices('abcdefghijkmnpqrstuvwxyz0123456789', k=4))
+
+def generate_post(rng: random.Random, index: int, image_names, paragraphs: int) -> str:
+    """生成一篇带 frontmatter 的文章，混合各种链接、提取码、中英文和图片"""
+    tags = rng.sample(TAGS, rng.randint(1, 3))
+    lines = [
+        '---',
+        f'title: 测试文章 {index}',
+        f'date: {rng.randint(2019, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        f"tags: [{', '.join(tags)}]",
+        f'categories: [{rng.choice(CATEGORIES)}]',
+        '---',
+        '',
+    ]
+    for name in image_names:
+        lines.append(f'![{name}](./{name})')
+        lines.append('')
+    for _ in range(paragraphs):
+        kind = rng.randint(0, 5)
+        if kind == 0:
+            lines.append(CJK_TEXT * rng.randint(1, 4))
+        elif kind == 1:
+            lines.append(' '.join(rng.choices(LATIN_WORDS, k=rng.randint(10, 40))) + '.')
+        elif kind == 2:
+            lines.append(f'[下载地址 提取码: {random_code(rng)}]({random_url(rng)})')
+        elif kind == 3:
+            lines.append(f'网盘地址：{random_url(rng)} 提取码：{random_code(rng)}')
+        elif kind == 4:
+            lines.append(' '.join(random_magnet(rng) for _ in range(rng.randint(1, 20))))
+        else:
+            lines.append(f'参见 [官网]({random_url(rng)})。备用 {random_url(rng)}')
+        lines.append('')
+    return '\n'.join(lines)
+
+def write_image(path: Path, rng: random.Random, width: int, height: int):
+    """写入一张测试图片，有 Pillow 时生成真实的噪声图"""
+    if Image is not None:
+        img = Image.effect_noise((width, height), rng.randint(20, 80)).convert('RGB')
+        img.save(path, 'JPEG' if path.suffix == '.jpg' else 'PNG')
+    else:
+        path.write_bytes(os.urandom(width * height // 4))
+
+def generate_corpus(root: Path, posts: int = 100, images_per_post: int = 2,
+                    image_size=(1280, 720), paragraphs: int = 30, seed: int = 0) -> Path:
+    """在 root 下生成 src/posts 语料，返回文章目录"""
+    rng = random.Random(seed)
+    src_dir = root / process_build.SRC_POSTS_DIR
+    for index in range(posts):
+        post_dir = src_dir / f'post-{index:05d}'
+        post_dir.mkdir(parents=True, exist_ok=True)
+        image_names = [
+            f'image-{n}.{rng.choice(["jpg", "png"])}' for n in range(images_per_post)
+        ]
+        for name in image_names:
+            write_image(post_dir / name, rng, *image_size)
+        (post_dir / 'index.md').write_text(
+            generate_post(rng, index, image_names, paragraphs), encoding='utf-8'
+        )
+    return src_dir
+
+def summarize(samples) -> dict:
+    """汇总多次运行的耗时（秒）"""
+    return {
+        'runs': len(samples),
+        'mean': statistics.mean(samples),
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+def timed(func, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽构建脚本的逐文件输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def bench_transform(src_dir: Path, key: bytes, repeat: int) -> dict:
+    """单篇文档转换：在内存中对每篇文章执行 process_markdown_content"""
+    documents = [path.read_text(encoding='utf-8') for path in sorted(src_dir.rglob('*.md'))]
+    total_bytes = sum(len(doc.encode('utf-8')) for doc in documents)
+
+    def run():
+        for doc in documents:
+            process_build.process_markdown_content(doc, key)
+
+    result = summarize(timed(run, repeat))
+    result['documents'] = len(documents)
+    result['bytes'] = total_bytes
+    result['mb_per_s'] = total_bytes / result['median'] / 1e6
+    return result
+
+def bench_markdown(corpus: Path, work_dir: Path, jobs: int, repeat: int) -> dict:
+    """完整的markdown处理：冷构建（无清单）和热构建（全部命中清单）"""
+    cold, warm = [], []
+    for _ in range(repeat):
+        shutil.rmtree(work_dir, ignore_errors=True)
+        shutil.copytree(corpus, work_dir / process_build.SRC_POSTS_DIR)
+        with quiet():
+            cold += timed(lambda: process_build.process_source_markdown(work_dir, None, jobs), 1)
+            warm += timed(lambda: process_build.process_source_markdown(work_dir, None, jobs), 1)
+    return {'jobs': jobs, 'cold': summarize(cold), 'warm': summarize(warm)}
+
+def bench_images(corpus: Path, work_dir: Path, jobs: int, repeat: int, optimize: bool) -> dict:
+    """图片处理：冷同步（public 目录为空）和热同步（没有变化）"""
+    cold, warm = [], []
+    for _ in range(repeat):
+        shutil.rmtree(work_dir, ignore_errors=True)
+        shutil.copytree(corpus, work_dir / process_build.SRC_POSTS_DIR)
+        with quiet():
+            cold += timed(lambda: process_build.copy_images(work_dir, optimize=optimize, jobs=jobs), 1)
+            warm += timed(lambda: process_build.copy_images(work_dir, optimize=optimize, jobs=jobs), 1)
+    images = process_build.collect_images(corpus)
+    return {
+        'optimize': optimize,
+        'images': len(images),
+        'bytes': sum(path.stat().st_size for path in images.values()),
+        'cold': summarize(cold),
+        'warm': summarize(warm),
+    }
+
+def bench_pathological(key: bytes) -> dict:
+    """病态输入：记录耗时并检查是否超过允许的上限"""
+    results = {}
+    for name, (content, limit) in PATHOLOGICAL_CASES.items():
+        elapsed = min(timed(lambda: process_build.process_markdown_content(content, key), 3))
+        results[name] = {'seconds': elapsed, 'limit': limit, 'ok': elapsed <= limit}
+    return results
+
+def compare(current: dict, baseline: dict):
+    """与之前保存的结果对比，打印各项中位数耗时的变化"""
+    def medians(results, prefix=''):
+        for name, value in results.items():
+            if isinstance(value, dict) and 'median' in value:
+                yield prefix + name, value['median']
+            elif isinstance(value, dict):
+                yield from medians(value, f'{prefix}{name}.')
+
+    old = dict(medians(baseline.get('results', {})))
+    for name, median in medians(current['results']):
+        if name in old and old[name] > 0:
+            print(f'{name:40} {old[name]:10.4f}s -> {median:10.4f}s  ({median / old[name]:.2f}x)')
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='process_build 性能基准测试')
+    parser.add_argument('--posts', type=int, default=200, help='生成的文章数量')
+    parser.add_argument('--paragraphs', type=int, default=30, help='每篇文章的段落数')
+    parser.add_argument('--images-per-post', type=int, default=2, help='每篇文章的图片数量')
+    parser.add_argument('--image-size', default='1280x720', help='图片尺寸，宽x高')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子，相同参数生成的语料完全一致')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='markdown 和图片处理的进程数')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试重复次数')
+    parser.add_argument(
+        '--bench', action='append', choices=['transform', 'markdown', 'images', 'pathological'],
+        help='只运行指定的测试（可重复），默认全部运行',
+    )
+    parser.add_argument('--optimize-images', action='store_true', help='图片测试包含 WebP 优化')
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的 JSON 结果对比')
+    parser.add_argument('--check', action='store_true', help='病态输入超时时返回非零退出码')
+    parser.add_argument('--keep', help='把生成的语料保留在指定目录')
+    args = parser.parse_args(argv)
+    try:
+        width, height = (int(n) for n in args.image_size.lower().split('x'))
+    except ValueError:
+        parser.error('--image-size must look like 1280x720')
+    args.image_size = (width, height)
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    benches = args.bench or ['transform', 'markdown', 'images', 'pathological']
+    key = process_build.generate_key(process_build.read_password())
+
+    with tempfile.TemporaryDirectory(prefix='bench_build_') as tmp:
+        corpus_root = Path(args.keep) if args.keep else Path(tmp) / 'corpus'
+        print(f'Generating corpus: {args.posts} posts in {corpus_root}')
+        corpus = generate_corpus(
+            corpus_root, args.posts, args.images_per_post, args.image_size, args.paragraphs, args.seed
+        )
+        work_dir = Path(tmp) / 'work'
+
+        results = {}
+        if 'transform' in benches:
+            print('Running transform benchmark...')
+            results['transform'] = bench_transform(corpus, key, args.repeat)
+        if 'markdown' in benches:
+            print('Running markdown pass benchmark...')
+            results['markdown'] = bench_markdown(corpus, work_dir, args.jobs, args.repeat)
+        if 'images' in benches:
+            print('Running image pass benchmark...')
+            results['images'] = bench_images(corpus, work_dir, args.jobs, args.repeat, args.optimize_images)
+        if 'pathological' in benches:
+            print('Running pathological input checks...')
+            results['pathological'] = bench_pathological(key)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'posts': args.posts,
+            'paragraphs': args.paragraphs,
+            'images_per_post': args.images_per_post,
+            'image_size': list(args.image_size),
+            'seed': args.seed,
+            'jobs': args.jobs,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    print(json.dumps(report['results'], ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'Results written to {args.output}')
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+    failed = [name for name, result in results.get('pathological', {}).items() if not result['ok']]
+    if failed:
+        print(f"Pathological inputs over time limit: {', '.join(failed)}")
+        if args.check:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
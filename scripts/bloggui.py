@@ -1,13 +1,267 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, scrolledtext
+from tkinter import ttk, filedialog, scrolledtext, simpledialog
 from tkinterdnd2 import DND_FILES, TkinterDnD
 import os
+import re
+import sys
+import signal
+import codecs
+import itertools
 import zipfile
 import time
+import queue
+import asyncio
 import subprocess
 import threading
-import shutil
+import sqlite3
+import logging
+import logging.handlers
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from post_import import extract_archive, ArchiveError, ImportCancelled
+from backup_store import BackupStore, BackupError
+from command_history import CommandHistory, format_seconds, format_trend
+import process_build
+
+# 控制台刷新间隔（毫秒），工作线程的输出先进入队列，由主线程按批写入控件
+LOG_POLL_MS = 50
+# 子进程输出每次读取的字节数
+READ_CHUNK_SIZE = 4096
+# 控制台最多保留的行数，超出后一次性删除最早的一批
+CONSOLE_MAX_LINES = 5000
+CONSOLE_TRIM_LINES = 1000
+# 完整的会话日志写入磁盘，按大小轮转
+LOG_DIR = os.path.join(os.path.expanduser("~"), ".bloghelper", "logs")
+LOG_FILE = os.path.join(LOG_DIR, "bloghelper.log")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# 日志搜索最多显示的结果行数
+SEARCH_MAX_RESULTS = 2000
+# 任务面板中运行时间的刷新间隔（毫秒）
+JOB_TICK_MS = 1000
+# 导入进度的最小刷新间隔（秒）
+PROGRESS_INTERVAL = 0.1
+# 同时解压的压缩包数量，解压主要受磁盘速度限制，线程过多反而更慢
+IMPORT_WORKERS = min(4, os.cpu_count() or 1)
+# Git 状态轮询间隔（毫秒）：只检查 .git/HEAD 和 refs 的文件状态，变化时才重新查询
+GIT_POLL_MS = 3000
+# 未提交文件数的最长刷新间隔（秒），工作区的修改无法通过 .git 目录感知
+DIRTY_REFRESH_SECONDS = 15
+
+def find_git_dir(project_path):
+    """返回仓库的 .git 目录（支持 worktree 中 .git 为文件的情况），不是仓库时返回 None"""
+    git_path = os.path.join(project_path, ".git")
+    if os.path.isdir(git_path):
+        return git_path
+    if os.path.isfile(git_path):
+        with open(git_path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        if content.startswith("gitdir:"):
+            return os.path.join(project_path, content[len("gitdir:"):].strip())
+    return None
+
+def git_refs_signature(git_dir):
+    """HEAD、packed-refs、refs 目录和配置文件的状态，任一变化说明分支信息可能变化
+
+    不包含 index：git status 刷新文件状态时会重写它，未提交文件数由单独的定时刷新负责。
+    """
+    entries = []
+    paths = [os.path.join(git_dir, name) for name in ("HEAD", "packed-refs", "config")]
+    for dirpath, _, filenames in os.walk(os.path.join(git_dir, "refs")):
+        paths.extend(os.path.join(dirpath, name) for name in filenames)
+    for path in sorted(paths):
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            continue
+        entries.append((path, stat_result.st_mtime_ns, stat_result.st_size))
+    return tuple(entries)
+
+def run_git(args, cwd):
+    """执行 git 命令（不经过 shell、不弹出窗口），返回标准输出"""
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+    return subprocess.check_output(
+        ["git"] + args,
+        cwd=cwd,
+        stderr=subprocess.DEVNULL,
+        encoding="utf-8",
+        errors="replace",
+        **kwargs
+    )
+
+def query_git_refs(project_path, git_dir):
+    """一次 for-each-ref 查询所有分支、当前分支和领先/落后信息"""
+    output = run_git(
+        [
+            "for-each-ref",
+            "--format=%(HEAD)%00%(refname)%00%(upstream:track,nobracket)",
+            "refs/heads", "refs/remotes",
+        ],
+        project_path
+    )
+    branches = []
+    remotes = []
+    current = None
+    track = ""
+    for line in output.splitlines():
+        head, refname, upstream_track = line.split("\0")
+        if refname.startswith("refs/heads/"):
+            name = refname[len("refs/heads/"):]
+            branches.append(name)
+            if head == "*":
+                current = name
+                track = upstream_track
+        elif refname.startswith("refs/remotes/"):
+            remote = refname[len("refs/remotes/"):].split("/", 1)[0]
+            if remote not in remotes:
+                remotes.append(remote)
+    
+    # 还没有拉取过的远程仓库没有 refs，从配置文件中补充
+    try:
+        with open(os.path.join(git_dir, "config"), "r", encoding="utf-8") as f:
+            for remote in re.findall(r'^\s*\[remote "([^"]+)"\]', f.read(), re.MULTILINE):
+                if remote not in remotes:
+                    remotes.append(remote)
+    except OSError:
+        pass
+    
+    counts = {direction: int(n) for direction, n in re.findall(r"(ahead|behind) (\d+)", track)}
+    return {
+        "branches": branches,
+        "remotes": remotes,
+        "current": current,
+        "ahead": counts.get("ahead", 0),
+        "behind": counts.get("behind", 0),
+        "upstream_gone": track == "gone",
+    }
+
+def count_dirty_files(project_path):
+    """未提交（含未跟踪）的文件数"""
+    output = run_git(["status", "--porcelain", "--untracked-files=normal"], project_path)
+    return sum(1 for line in output.splitlines() if line.strip())
+
+class JobStep:
+    """任务中的一个步骤：一条命令及其执行结果"""
+    def __init__(self, label, command, extra_env=None):
+        self.label = label
+        self.command = command
+        self.extra_env = extra_env
+        self.status = "等待中"
+        self.started = None
+        self.elapsed = None
+        self.returncode = None
+        
+    def elapsed_text(self):
+        if self.elapsed is not None:
+            return f"{self.elapsed:.1f}s"
+        if self.started is not None:
+            return f"{time.monotonic() - self.started:.0f}s"
+        return ""
+
+_job_ids = itertools.count(1)
+
+class Job:
+    """一个任务：在同一工作目录中按顺序执行的若干步骤，任一步骤失败即停止"""
+    def __init__(self, name, steps, cwd):
+        self.id = next(_job_ids)
+        self.name = name
+        self.steps = steps
+        self.cwd = cwd
+        self.status = "等待中"
+        self.cancelled = threading.Event()
+        self.pid = None
+        
+    def cancel(self):
+        """取消任务：排队中的任务不再执行，正在运行的子进程连同其子进程一起结束"""
+        self.cancelled.set()
+        if self.pid is not None:
+            kill_process_tree(self.pid)
+
+def kill_process_tree(pid):
+    """结束 shell 进程及其启动的所有子进程"""
+    try:
+        if os.name == 'nt':
+            subprocess.run(
+                f"taskkill /F /T /PID {pid}",
+                shell=True,
+                capture_output=True,
+                creationflags=subprocess.CREATE_NO_WINDOW
+            )
+        else:
+            os.killpg(pid, signal.SIGTERM)
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+class JobScheduler:
+    """任务调度：同一工作目录的任务排队依次执行，不同工作目录的任务并行执行"""
+    def __init__(self, run_step, on_update):
+        self.run_step = run_step      # run_step(job, step) -> 返回码
+        self.on_update = on_update    # on_update(job)，任务状态变化时调用
+        self.queues = {}
+        self.lock = threading.Lock()
+        
+    def submit(self, job):
+        key = os.path.normcase(os.path.abspath(job.cwd))
+        with self.lock:
+            pending = self.queues.get(key)
+            if pending is not None:
+                pending.append(job)
+                self.on_update(job)
+                return
+            self.queues[key] = deque([job])
+        self.on_update(job)
+        threading.Thread(target=self.worker, args=(key,), daemon=True).start()
+        
+    def worker(self, key):
+        """依次执行某个工作目录下排队的任务，队列为空时退出"""
+        while True:
+            with self.lock:
+                pending = self.queues[key]
+                if not pending:
+                    del self.queues[key]
+                    return
+                job = pending[0]
+            try:
+                self.run_job(job)
+            finally:
+                with self.lock:
+                    pending.popleft()
+                    
+    def run_job(self, job):
+        if job.cancelled.is_set():
+            self.finish(job, "已取消", job.steps)
+            return
+        job.status = "运行中"
+        for index, step in enumerate(job.steps):
+            if job.cancelled.is_set():
+                self.finish(job, "已取消", job.steps[index:])
+                return
+            step.status = "运行中"
+            step.started = time.monotonic()
+            self.on_update(job)
+            try:
+                step.returncode = self.run_step(job, step)
+            except Exception:
+                step.returncode = -1
+            finally:
+                job.pid = None
+            step.elapsed = time.monotonic() - step.started
+            if step.returncode == 0:
+                step.status = "成功"
+                continue
+            step.status = "已取消" if job.cancelled.is_set() else "失败"
+            self.finish(job, step.status, job.steps[index + 1:])
+            return
+        self.finish(job, "成功", [])
+        
+    def finish(self, job, status, skipped_steps):
+        for step in skipped_steps:
+            step.status = "已跳过"
+        job.status = status
+        self.on_update(job)
 
 class BlogHelperGUI:
     def __init__(self, root):
@@ -18,19 +272,53 @@ class BlogHelperGUI:
         # 变量初始化
         self.project_path = tk.StringVar()
         self.posts_path = tk.StringVar()
-        self.zip_path = tk.StringVar()
         self.git_branch = tk.StringVar()
         self.git_remote = tk.StringVar()
         
-        # 命令执行状态
-        self.command_running = False
-        self.command_lock = threading.Lock()
+        # Git 状态缓存：{项目路径: {'signature', 'state', 'dirty_checked'}}
+        self.git_cache = {}
+        self.git_refreshing = False
+        # 上次显示的 (项目路径, 当前分支)，当前分支变化时才覆盖分支选择框中用户选择的分支
+        self.git_shown_branch = None
+        
+        # ZIP 导入：在有限的线程池中并行解压，可以取消
+        # import_rows 为 {压缩包表格行: 进度(0~1)}，一批全部完成后清空
+        self.import_pool = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+        self.import_cancel = None
+        self.import_rows = {}
+        self.import_pending = 0
+        self.import_row_ids = itertools.count(1)
+        
+        # 导入后只加密新文章的链接；密钥派生较慢，只计算一次
+        # 构建清单由多个导入线程共用，加密时串行写入
+        self.encrypt_on_import = tk.BooleanVar(value=True)
+        self.build_key = None
+        self.encrypt_lock = threading.Lock()
+        
+        # 任务调度：同一项目的命令排队执行，可以取消
+        self.scheduler = JobScheduler(self.run_job_step, self.on_job_update)
+        self.jobs = {}
+        
+        # 日志队列：任意线程都可以写入，只有 Tk 主线程读取并更新控件
+        self.log_queue = queue.Queue()
+        # 需要在 Tk 主线程中执行的回调
+        self.ui_queue = queue.Queue()
+        self.search_text = tk.StringVar()
+        self.file_logger = self.setup_file_logger()
+        
+        # 命令执行历史（SQLite），统计各命令的耗时分布和变化趋势
+        self.history = self.open_history()
+        self.history_project_only = tk.BooleanVar(value=True)
         
         # 设置窗口支持文件拖放
         self.root.drop_target_register(DND_FILES)
         self.root.dnd_bind('<<Drop>>', self.handle_drop)
         
         self.setup_ui()
+        self.refresh_command_stats()
+        self.root.after(LOG_POLL_MS, self.drain_log_queue)
+        self.root.after(JOB_TICK_MS, self.tick_jobs)
+        self.root.after(GIT_POLL_MS, self.poll_git_state)
         
     def setup_ui(self):
         # 创建左右分栏
@@ -59,6 +347,9 @@ class BlogHelperGUI:
         self.branch_combo = ttk.Combobox(git_frame, textvariable=self.git_branch)
         self.branch_combo.pack(fill=tk.X, pady=2)
         
+        self.git_status = tk.StringVar(value="")
+        ttk.Label(git_frame, textvariable=self.git_status).pack(anchor=tk.W, pady=2)
+        
         ttk.Button(git_frame, text="刷新Git信息", command=self.refresh_git_info).pack(anchor=tk.W, pady=2)
         
         # 文章路径设置
@@ -84,7 +375,36 @@ class BlogHelperGUI:
         # 点击事件
         self.drop_area.bind("<Button-1>", self.select_zip)
         
-        ttk.Button(drop_frame, text="选择ZIP文件", command=self.select_zip).pack(anchor=tk.W, pady=2)
+        ttk.Button(drop_frame, text="选择ZIP文件（可多选）", command=self.select_zip).pack(anchor=tk.W, pady=2)
+        
+        # 导入进度
+        self.import_progress = ttk.Progressbar(drop_frame, mode="determinate", maximum=100)
+        self.import_progress.pack(fill=tk.X, pady=2)
+        self.import_status = tk.StringVar(value="")
+        ttk.Label(drop_frame, textvariable=self.import_status).pack(anchor=tk.W)
+        self.cancel_import_button = ttk.Button(drop_frame, text="取消导入", command=self.cancel_import, state=tk.DISABLED)
+        self.cancel_import_button.pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(drop_frame, text="导入后加密文章链接", variable=self.encrypt_on_import).pack(anchor=tk.W)
+        
+        # 每个压缩包的导入结果
+        self.import_tree = ttk.Treeview(drop_frame, columns=("status", "files", "size", "dir"), height=5)
+        self.import_tree.heading("#0", text="压缩包")
+        self.import_tree.heading("status", text="状态")
+        self.import_tree.heading("files", text="文件数")
+        self.import_tree.heading("size", text="大小")
+        self.import_tree.heading("dir", text="文章目录")
+        self.import_tree.column("#0", width=140)
+        self.import_tree.column("status", width=70, anchor=tk.CENTER)
+        self.import_tree.column("files", width=50, anchor=tk.E)
+        self.import_tree.column("size", width=70, anchor=tk.E)
+        self.import_tree.column("dir", width=120)
+        self.import_tree.pack(fill=tk.X, pady=2)
+        
+        # 备份管理
+        backup_frame = ttk.LabelFrame(left_frame, text="导入备份", padding=5)
+        backup_frame.pack(fill=tk.X, pady=5)
+        ttk.Button(backup_frame, text="恢复备份", command=self.restore_backup).pack(side=tk.LEFT, padx=2)
+        ttk.Button(backup_frame, text="清理旧备份", command=self.gc_backups).pack(side=tk.LEFT, padx=2)
         
         # 右侧控制台输出
         console_frame = ttk.LabelFrame(right_frame, text="控制台输出", padding=5)
@@ -93,6 +413,15 @@ class BlogHelperGUI:
         self.console = scrolledtext.ScrolledText(console_frame, height=20)
         self.console.pack(fill=tk.BOTH, expand=True, pady=2)
         
+        # 日志搜索（在磁盘上的完整日志中搜索，而不是控制台中保留的部分）
+        search_frame = ttk.Frame(console_frame)
+        search_frame.pack(fill=tk.X, pady=2)
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_text)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        search_entry.bind("<Return>", lambda event: self.search_log())
+        ttk.Button(search_frame, text="搜索日志", command=self.search_log).pack(side=tk.LEFT, padx=2)
+        ttk.Button(search_frame, text="清空控制台", command=lambda: self.console.delete("1.0", tk.END)).pack(side=tk.LEFT, padx=2)
+        
         # Git操作按钮
         git_buttons_frame = ttk.LabelFrame(right_frame, text="Git操作", padding=5)
         git_buttons_frame.pack(fill=tk.X, pady=5)
@@ -110,63 +439,137 @@ class BlogHelperGUI:
         ttk.Button(npm_buttons_frame, text="npm install", command=lambda: self.run_command("npm install")).pack(side=tk.LEFT, padx=2)
         ttk.Button(npm_buttons_frame, text="npm run build", command=lambda: self.run_command("npm run build")).pack(side=tk.LEFT, padx=2)
         
+        # 任务队列
+        jobs_frame = ttk.LabelFrame(right_frame, text="任务队列", padding=5)
+        jobs_frame.pack(fill=tk.X, pady=5)
+        
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=("status", "elapsed"), height=6)
+        self.jobs_tree.heading("#0", text="任务")
+        self.jobs_tree.heading("status", text="状态")
+        self.jobs_tree.heading("elapsed", text="用时")
+        self.jobs_tree.column("status", width=80, anchor=tk.CENTER)
+        self.jobs_tree.column("elapsed", width=80, anchor=tk.E)
+        self.jobs_tree.pack(fill=tk.X, pady=2)
+        
+        jobs_buttons = ttk.Frame(jobs_frame)
+        jobs_buttons.pack(fill=tk.X)
+        ttk.Button(jobs_buttons, text="发布流程", command=self.run_publish_pipeline).pack(side=tk.LEFT, padx=2)
+        ttk.Button(jobs_buttons, text="构建流程", command=self.run_build_pipeline).pack(side=tk.LEFT, padx=2)
+        ttk.Button(jobs_buttons, text="取消选中任务", command=self.cancel_selected_job).pack(side=tk.LEFT, padx=2)
+        ttk.Button(jobs_buttons, text="清除已完成", command=self.clear_finished_jobs).pack(side=tk.LEFT, padx=2)
+        
+        # 命令耗时统计（只统计成功执行的耗时，趋势为最近几次与之前几次的中位数之比）
+        stats_frame = ttk.LabelFrame(right_frame, text="命令耗时统计", padding=5)
+        stats_frame.pack(fill=tk.X, pady=5)
+        
+        columns = ("runs", "failures", "p50", "p95", "last", "trend", "spark")
+        self.stats_tree = ttk.Treeview(stats_frame, columns=columns, height=5)
+        self.stats_tree.heading("#0", text="命令")
+        for column, text, width in (("runs", "次数", 45), ("failures", "失败", 45), ("p50", "p50", 60),
+                                    ("p95", "p95", 60), ("last", "最近", 60), ("trend", "趋势", 55)):
+            self.stats_tree.heading(column, text=text)
+            self.stats_tree.column(column, width=width, anchor=tk.E)
+        self.stats_tree.heading("spark", text="耗时走势")
+        self.stats_tree.column("#0", width=120)
+        self.stats_tree.column("spark", width=140)
+        self.stats_tree.pack(fill=tk.X, pady=2)
+        
+        stats_buttons = ttk.Frame(stats_frame)
+        stats_buttons.pack(fill=tk.X)
+        ttk.Button(stats_buttons, text="刷新统计", command=self.refresh_command_stats).pack(side=tk.LEFT, padx=2)
+        ttk.Checkbutton(stats_buttons, text="仅当前项目", variable=self.history_project_only,
+                        command=self.refresh_command_stats).pack(side=tk.LEFT, padx=2)
+        
         # 设置默认值
         self.posts_path.set("src/posts/")
         
     def handle_drop(self, event):
-        """处理文件拖放"""
-        file_path = event.data.strip('{}')  # 去除可能的大括号
-        if file_path.lower().endswith('.zip'):
-            self.zip_path.set(file_path)
-            self.process_zip()
+        """处理文件拖放，可以一次拖入多个文件"""
+        # 拖放数据是 Tcl 列表，含空格的路径会被大括号包住
+        paths = self.root.tk.splitlist(event.data)
+        zip_paths = [path for path in paths if path.lower().endswith('.zip')]
+        for path in paths:
+            if not path.lower().endswith('.zip'):
+                self.log_message(f"已忽略非ZIP文件: {path}")
+        if zip_paths:
+            self.process_zips(zip_paths)
         else:
             self.log_message("请拖入ZIP文件")
             
-    def refresh_git_info(self):
-        """刷新Git仓库和分支信息"""
-        if not self.project_path.get():
-            self.log_message("请先选择项目路径")
+    def refresh_git_info(self, force=True):
+        """在后台刷新Git仓库和分支信息；refs 没有变化时使用缓存，只刷新未提交文件数"""
+        project_path = self.project_path.get()
+        if not project_path:
+            if force:
+                self.log_message("请先选择项目路径")
             return
-            
-        try:
-            # 获取远程仓库列表
-            remotes = subprocess.check_output(
-                "git remote",
-                shell=True,
-                cwd=self.project_path.get(),
-                text=True
-            ).strip().split('\n')
-            if remotes and remotes[0]:  # 检查是否为空列表或只包含空字符串
-                self.remote_combo['values'] = remotes
-                self.git_remote.set(remotes[0])
-                
-            # 获取分支列表
-            branches = subprocess.check_output(
-                "git branch",
-                shell=True,
-                cwd=self.project_path.get(),
-                text=True
-            ).strip().split('\n')
-            if branches:
-                # 去除'*'标记和空格
-                branches = [b.replace('*', '').strip() for b in branches]
-                self.branch_combo['values'] = branches
+        if self.git_refreshing:
+            return
+        self.git_refreshing = True
+        
+        def refresh():
+            try:
+                git_dir = find_git_dir(project_path)
+                if git_dir is None:
+                    if force:
+                        self.log_message("所选项目不是Git仓库")
+                    return
+                signature = git_refs_signature(git_dir)
+                cached = self.git_cache.get(project_path)
+                refs_changed = cached is None or cached["signature"] != signature
+                now = time.monotonic()
+                if not (force or refs_changed or now - cached["dirty_checked"] >= DIRTY_REFRESH_SECONDS):
+                    return
                 
-                # 获取当前分支
-                current_branch = subprocess.check_output(
-                    "git branch --show-current",
-                    shell=True,
-                    cwd=self.project_path.get(),
-                    text=True
-                ).strip()
-                self.git_branch.set(current_branch)
+                state = query_git_refs(project_path, git_dir) if refs_changed else cached["state"]
+                state = dict(state, dirty=count_dirty_files(project_path))
+                self.git_cache[project_path] = {
+                    "signature": signature,
+                    "state": state,
+                    "dirty_checked": now,
+                }
+                self.call_in_ui(self.show_git_state, project_path, state, refs_changed or force)
+                if force:
+                    self.log_message("Git信息已更新")
+            except subprocess.CalledProcessError as e:
+                self.log_message(f"Git命令执行失败: {str(e)}")
+            except Exception as e:
+                self.log_message(f"更新Git信息时出错: {str(e)}")
+            finally:
+                self.git_refreshing = False
                 
-            self.log_message("Git信息已更新")
-            
-        except subprocess.CalledProcessError as e:
-            self.log_message(f"Git命令执行失败: {str(e)}")
-        except Exception as e:
-            self.log_message(f"更新Git信息时出错: {str(e)}")
+        threading.Thread(target=refresh, daemon=True).start()
+        
+    def show_git_state(self, project_path, state, refs_changed):
+        """在主线程中更新Git面板"""
+        if project_path != self.project_path.get():
+            return  # 查询期间切换了项目
+        if refs_changed:
+            if state["remotes"]:
+                self.remote_combo['values'] = state["remotes"]
+                if self.git_remote.get() not in state["remotes"]:
+                    self.git_remote.set(state["remotes"][0])
+            self.branch_combo['values'] = state["branches"]
+            shown = (project_path, state["current"])
+            if state["current"] and shown != self.git_shown_branch:
+                self.git_branch.set(state["current"])
+            self.git_shown_branch = shown
+        
+        parts = []
+        if state["upstream_gone"]:
+            parts.append("上游分支已删除")
+        elif state["ahead"] or state["behind"]:
+            parts.append(f"领先 {state['ahead']} / 落后 {state['behind']}")
+        else:
+            parts.append("与上游同步")
+        parts.append(f"{state['dirty']} 个文件未提交" if state["dirty"] else "工作区干净")
+        self.git_status.set(" · ".join(parts))
+        
+    def poll_git_state(self):
+        """定期在后台检查Git状态，refs 没有变化时不执行 git 命令"""
+        if self.project_path.get():
+            self.refresh_git_info(force=False)
+        self.root.after(GIT_POLL_MS, self.poll_git_state)
             
     def git_checkout(self):
         """切换Git分支"""
@@ -208,93 +611,8 @@ class BlogHelperGUI:
             self.log_message(f"检查Git凭证时出错: {str(e)}")
             
     def run_command_with_progress(self, command):
-        """执行命令并显示进度"""
-        if self.command_running:
-            self.log_message("有命令正在执行，请等待完成...")
-            return
-            
-        def execute():
-            try:
-                with self.command_lock:
-                    if self.command_running:
-                        return
-                    self.command_running = True
-                
-                project_path = self.project_path.get()
-                if not project_path:
-                    self.log_message("请先选择项目路径")
-                    return
-                    
-                self.log_message(f"开始执行命令: {command}")
-                
-                # 设置环境变量
-                my_env = os.environ.copy()
-                my_env["PYTHONIOENCODING"] = "utf-8"
-                my_env["GIT_TERMINAL_PROMPT"] = "0"  # 禁用 Git 终端提示
-                
-                startupinfo = None
-                if os.name == 'nt':
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    cwd=project_path,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    env=my_env,
-                    startupinfo=startupinfo,
-                    encoding='utf-8',
-                    errors='replace'
-                )
-                
-                # 使用非阻塞方式读取输出
-                self.log_message("正在执行中，请稍候...")
-                
-                while True:
-                    # 读取输出，设置超时
-                    try:
-                        stdout_line = process.stdout.readline()
-                        if stdout_line:
-                            self.log_message(stdout_line.strip())
-                        
-                        stderr_line = process.stderr.readline()
-                        if stderr_line:
-                            self.log_message(f"错误: {stderr_line.strip()}")
-                            
-                        # 检查进程是否结束
-                        if process.poll() is not None:
-                            break
-                            
-                    except Exception as e:
-                        self.log_message(f"读取输出时出错: {str(e)}")
-                        break
-                
-                # 获取剩余输出
-                remaining_out, remaining_err = process.communicate()
-                if remaining_out:
-                    self.log_message(remaining_out)
-                if remaining_err:
-                    self.log_message(f"错误: {remaining_err}")
-                
-                # 检查返回码
-                if process.returncode == 0:
-                    self.log_message(f"命令 '{command}' 执行成功")
-                else:
-                    self.log_message(f"命令执行失败，返回码: {process.returncode}")
-                
-            except subprocess.CalledProcessError as e:
-                self.log_message(f"命令执行失败: {str(e)}")
-            except Exception as e:
-                self.log_message(f"执行命令时出错: {str(e)}")
-            finally:
-                with self.command_lock:
-                    self.command_running = False
-                
-        # 在新线程中运行命令
-        thread = threading.Thread(target=execute)
-        thread.start()
+        """执行命令并实时显示进度（禁用 Git 终端提示）"""
+        self.start_command(command, {"GIT_TERMINAL_PROMPT": "0"})
             
     def select_project(self):
         """选择项目文件夹"""
@@ -303,146 +621,573 @@ class BlogHelperGUI:
             self.project_path.set(path)
             self.log_message(f"已选择项目路径: {path}")
             self.refresh_git_info()
+            self.refresh_command_stats()
             
     def select_zip(self, event=None):
-        """选择ZIP文件"""
-        path = filedialog.askopenfilename(filetypes=[("ZIP files", "*.zip")])
-        if path:
-            self.zip_path.set(path)
-            self.process_zip()
+        """选择一个或多个ZIP文件"""
+        paths = filedialog.askopenfilenames(filetypes=[("ZIP files", "*.zip")])
+        if paths:
+            self.process_zips(list(paths))
             
-    def process_zip(self):
-        """处理ZIP文件，解压到文章目录并备份"""
-        try:
-            zip_path = self.zip_path.get()
-            if not zip_path:
-                self.log_message("请先选择ZIP文件")
-                return
-                
-            project_path = self.project_path.get()
-            if not project_path:
-                self.log_message("请先选择项目路径")
-                return
+    def process_zips(self, zip_paths):
+        """把压缩包加入导入线程池，每个压缩包解压到独立的文章目录并备份"""
+        project_path = self.project_path.get()
+        if not project_path:
+            self.log_message("请先选择项目路径")
+            return
+        posts_root = os.path.join(project_path, self.posts_path.get())
+        
+        # 导入进行中时，新的压缩包加入同一批，共用同一个取消开关（已取消时换一个新的）
+        if self.import_cancel is None or self.import_cancel.is_set():
+            self.import_cancel = threading.Event()
+            self.cancel_import_button.config(state=tk.NORMAL)
+            self.import_progress['value'] = 0
+            
+        for zip_path in zip_paths:
+            row = f"import-{next(self.import_row_ids)}"
+            self.import_tree.insert("", tk.END, iid=row, text=os.path.basename(zip_path),
+                                    values=("等待", "", "", ""))
+            self.import_rows[row] = 0.0
+            self.import_pending += 1
+            self.import_pool.submit(
+                self.ingest_zip, row, zip_path, project_path, posts_root, self.import_cancel,
+                self.encrypt_on_import.get()
+            )
+        self.update_import_summary()
+        
+    def create_article_dir(self, posts_root, store):
+        """创建以时间戳命名的文章目录，同名目录或导入ID已存在时追加序号，返回 (目录, 导入ID)
+        
+        用 makedirs 创建目录本身作为占位，多个线程同时导入也不会选中同一个目录。
+        """
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        os.makedirs(posts_root, exist_ok=True)
+        for n in itertools.count():
+            import_id = timestamp if n == 0 else f"{timestamp}-{n}"
+            if os.path.exists(store.manifest_path(import_id)):
+                continue
+            article_dir = os.path.join(posts_root, import_id)
+            try:
+                os.makedirs(article_dir)
+            except FileExistsError:
+                continue
+            return article_dir, import_id
+        
+    def ingest_zip(self, row, zip_path, project_path, posts_root, cancel_event, encrypt=False):
+        """工作线程：流式解压，解压的同时写入去重备份库，然后可选地加密新文章"""
+        last_update = [0.0]
+        
+        def progress(written, total, name):
+            now = time.monotonic()
+            if now - last_update[0] >= PROGRESS_INTERVAL or written == total:
+                last_update[0] = now
+                self.call_in_ui(self.update_import_progress, row, written, total)
                 
-            # 验证ZIP文件
+        status = "失败"
+        result = None
+        article_dir = ""
+        try:
+            if cancel_event.is_set():
+                raise ImportCancelled()
             if not zipfile.is_zipfile(zip_path):
-                self.log_message("所选文件不是有效的ZIP文件")
+                self.log_message(f"所选文件不是有效的ZIP文件: {zip_path}")
+                status = "无效"
                 return
-                
-            # 创建文章目录
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            article_dir = os.path.join(
-                project_path,
-                self.posts_path.get(),
-                timestamp
+            self.call_in_ui(self.import_tree.set, row, "status", "导入中")
+            self.log_message(f"开始导入: {zip_path}")
+            store = BackupStore(os.path.join(project_path, "backup"))
+            article_dir, import_id = self.create_article_dir(posts_root, store)
+            result = extract_archive(zip_path, article_dir, store, progress, cancel_event)
+            self.log_message(f"已解压 {result['files']} 个文件（{result['bytes']} 字节）到: {article_dir}")
+            store.save_import(
+                import_id,
+                os.path.relpath(article_dir, project_path),
+                result['entries'],
+                os.path.basename(zip_path)
             )
-            
-            # 检查文章目录是否已存在
-            if os.path.exists(article_dir):
-                self.log_message(f"文件夹已存在: {article_dir}")
-                return
-                
-            os.makedirs(article_dir)
-            self.log_message(f"创建文章目录: {article_dir}")
-            
-            # 解压文件
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(article_dir)
-            self.log_message(f"文件已解压到: {article_dir}")
-            
-            # 创建备份目录
-            backup_base = os.path.join(project_path, "backup")
-            os.makedirs(backup_base, exist_ok=True)
-            
-            backup_dir = os.path.join(backup_base, timestamp)
-            if os.path.exists(backup_dir):
-                self.log_message(f"备份目录已存在: {backup_dir}")
-                return
-                
-            # 使用copytree进行完整备份
-            shutil.copytree(article_dir, backup_dir)
-            self.log_message(f"文件已备份到: {backup_dir}")
-            
+            self.log_message(f"文件已备份，导入ID: {import_id}")
+            status = "完成"
+            if encrypt:
+                self.call_in_ui(self.import_tree.set, row, "status", "加密中")
+                status = self.encrypt_article(project_path, article_dir)
+        except ImportCancelled:
+            self.log_message(f"导入已取消: {zip_path}")
+            status = "已取消"
+        except ArchiveError as e:
+            self.log_message(f"ZIP文件被拒绝: {zip_path}: {str(e)}")
+            status = "已拒绝"
         except zipfile.BadZipFile:
-            self.log_message("无效的ZIP文件格式")
+            self.log_message(f"无效的ZIP文件格式: {zip_path}")
+            status = "无效"
         except PermissionError:
             self.log_message("无法访问文件或目录，请检查权限")
         except Exception as e:
-            self.log_message(f"处理ZIP文件时出错: {str(e)}")
+            self.log_message(f"处理ZIP文件时出错: {zip_path}: {str(e)}")
+        finally:
+            if not status.startswith("完成"):
+                article_dir = ""
+            self.call_in_ui(self.finish_zip, row, status, result, article_dir)
             
-    def run_command(self, command):
-        """在新线程中执行命令"""
-        if self.command_running:
-            self.log_message("有命令正在执行，请等待完成...")
+    def encrypt_article(self, project_path, article_dir):
+        """只加密新文章目录中的markdown文件，并写入构建清单，完整构建时这些文件会被跳过"""
+        try:
+            with self.encrypt_lock:
+                if self.build_key is None:
+                    self.build_key = process_build.generate_key(process_build.read_password())
+                stats = process_build.process_source_markdown(
+                    project_path, [article_dir], key=self.build_key
+                )
+        except ValueError as e:
+            # 文章路径不在构建脚本处理的 src/posts 下
+            self.log_message(f"跳过加密: {str(e)}")
+            return "完成（未加密）"
+        except Exception as e:
+            self.log_message(f"加密文章时出错: {str(e)}")
+            return "完成（未加密）"
+        if stats['failed']:
+            self.log_message(f"有 {stats['failed']} 个文件加密失败，请运行完整构建")
+            return "完成（未加密）"
+        self.log_message(f"已加密 {stats['processed']} 个文件中的 {stats['links']} 个链接")
+        return "完成"
+        
+    def update_import_progress(self, row, written, total):
+        if row in self.import_rows:
+            self.import_rows[row] = written / total if total else 1.0
+            self.update_import_summary()
+        
+    def update_import_summary(self):
+        """总进度为本批所有压缩包进度的平均值"""
+        if not self.import_rows:
             return
+        self.import_progress['value'] = sum(self.import_rows.values()) * 100 / len(self.import_rows)
+        done = len(self.import_rows) - self.import_pending
+        self.import_status.set(f"已处理 {done} / {len(self.import_rows)} 个压缩包")
+        
+    def finish_zip(self, row, status, result, article_dir):
+        """在主线程中记录一个压缩包的结果，整批完成后汇总"""
+        self.import_tree.item(row, values=(
+            status,
+            result['files'] if result else "",
+            f"{result['bytes'] / 1048576:.1f} MB" if result else "",
+            os.path.basename(article_dir),
+        ))
+        self.import_rows[row] = 1.0
+        self.import_pending -= 1
+        self.update_import_summary()
+        if self.import_pending == 0:
+            self.finish_import()
             
-        def execute():
+    def finish_import(self):
+        statuses = [self.import_tree.set(row, "status") for row in self.import_rows]
+        succeeded = sum(1 for status in statuses if status.startswith("完成"))
+        self.log_message(f"批量导入结束：成功 {succeeded} 个，失败或取消 {len(statuses) - succeeded} 个")
+        self.import_cancel = None
+        self.import_rows = {}
+        self.cancel_import_button.config(state=tk.DISABLED)
+        self.import_status.set("")
+        
+    def backup_store(self):
+        project_path = self.project_path.get()
+        if not project_path:
+            self.log_message("请先选择项目路径")
+            return None
+        return BackupStore(os.path.join(project_path, "backup"))
+        
+    def restore_backup(self):
+        """选择一次导入的清单，在后台重建其文章目录"""
+        store = self.backup_store()
+        if store is None:
+            return
+        path = filedialog.askopenfilename(
+            initialdir=store.imports_dir, filetypes=[("备份清单", "*.json")]
+        )
+        if not path:
+            return
+        import_id = os.path.splitext(os.path.basename(path))[0]
+        project_path = self.project_path.get()
+        
+        def restore():
             try:
-                with self.command_lock:
-                    if self.command_running:
-                        return
-                    self.command_running = True
-                
-                project_path = self.project_path.get()
-                if not project_path:
-                    self.log_message("请先选择项目路径")
-                    return
-                    
-                self.log_message(f"开始执行命令: {command}")
-                
-                # 设置环境变量以支持UTF-8
-                my_env = os.environ.copy()
-                my_env["PYTHONIOENCODING"] = "utf-8"
-                
-                startupinfo = None
-                if os.name == 'nt':
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                    startupinfo.wShowWindow = subprocess.SW_HIDE
+                manifest = store.load_import(import_id)
+                target = os.path.join(project_path, manifest["article_dir"])
+                store.restore(import_id, target)
+                self.log_message(f"已恢复 {len(manifest['files'])} 个文件到: {target}")
+            except BackupError as e:
+                self.log_message(f"恢复备份失败: {str(e)}")
+            except Exception as e:
+                self.log_message(f"恢复备份时出错: {str(e)}")
                 
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    cwd=project_path,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    env=my_env,
-                    startupinfo=startupinfo,
-                    encoding='utf-8',
-                    errors='replace'
+        threading.Thread(target=restore, daemon=True).start()
+        
+    def gc_backups(self):
+        """按保留策略清理旧备份并删除不再被引用的文件"""
+        store = self.backup_store()
+        if store is None:
+            return
+        # 进行中的导入已写入的对象还没有清单引用，清理会删除它们
+        if self.import_pending > 0:
+            self.log_message("正在导入文章，请在导入完成后再清理备份")
+            return
+        keep_last = simpledialog.askinteger("清理旧备份", "保留最近几次导入:", initialvalue=20, minvalue=0)
+        if keep_last is None or self.import_pending > 0:
+            return
+        
+        def gc():
+            try:
+                result = store.gc(keep_last=keep_last)
+                self.log_message(
+                    f"已删除 {len(result['removed_imports'])} 个旧备份，"
+                    f"{result['removed_blobs']} 个文件，释放 {result['freed_bytes']} 字节"
                 )
-                
-                stdout, stderr = process.communicate()
-                
-                if stdout:
-                    self.log_message(f"命令输出:\n{stdout}")
-                if stderr:
-                    self.log_message(f"错误输出:\n{stderr}")
-                    
-                self.log_message(f"命令 '{command}' 执行完成")
-                
-            except subprocess.CalledProcessError as e:
-                self.log_message(f"命令执行失败: {str(e)}")
             except Exception as e:
-                self.log_message(f"执行命令时出错: {str(e)}")
-            finally:
-                with self.command_lock:
-                    self.command_running = False
+                self.log_message(f"清理备份时出错: {str(e)}")
                 
-        # 在新线程中运行命令
-        thread = threading.Thread(target=execute)
-        thread.start()
+        threading.Thread(target=gc, daemon=True).start()
+        
+    def cancel_import(self):
+        """取消正在进行和等待中的所有导入"""
+        if self.import_cancel is not None:
+            self.import_cancel.set()
+            
+    def run_command(self, command):
+        """在新线程中执行命令"""
+        self.start_command(command)
+        
+    def start_command(self, command, extra_env=None):
+        """把单条命令作为任务加入队列"""
+        self.submit_job(command, [JobStep(command, command, extra_env)])
+        
+    def submit_job(self, name, steps):
+        """提交任务，同一项目中的任务按提交顺序依次执行"""
+        project_path = self.project_path.get()
+        if not project_path:
+            self.log_message("请先选择项目路径")
+            return None
+        job = Job(name, steps, project_path)
+        self.jobs[job.id] = job
+        self.scheduler.submit(job)
+        return job
+        
+    def build_steps(self):
+        """process_build 与 npm run build 两个构建步骤"""
+        build_script = os.path.join("scripts", "process_build.py")
+        return [
+            JobStep("process_build", f'"{sys.executable}" "{build_script}"'),
+            JobStep("npm run build", "npm run build"),
+        ]
+        
+    def run_build_pipeline(self):
+        """构建流程：process_build → npm run build"""
+        self.submit_job("构建流程", self.build_steps())
+        
+    def run_publish_pipeline(self):
+        """发布流程：pull → process_build → npm run build → add → commit → push"""
+        remote = self.git_remote.get()
+        branch = self.git_branch.get()
+        if not (remote and branch):
+            self.log_message("请先选择远程仓库和分支")
+            return
+        commit_message = simpledialog.askstring("发布流程", "请输入提交信息:")
+        if not commit_message:
+            return
+        self.check_git_credentials()
+        no_prompt = {"GIT_TERMINAL_PROMPT": "0"}
+        steps = [JobStep("git pull", "git pull", no_prompt)]
+        steps += self.build_steps()
+        steps += [
+            JobStep("git add", "git add ."),
+            JobStep("git commit", f'git commit -m "{commit_message}"'),
+            JobStep("git push", f"git push {remote} {branch}", no_prompt),
+        ]
+        self.submit_job("发布流程", steps)
+        
+    def run_job_step(self, job, step):
+        """在调度线程中执行一个步骤，返回退出码"""
+        total = len(job.steps)
+        index = job.steps.index(step) + 1
+        self.log_message(f"[{job.name}] 步骤 {index}/{total} 开始执行命令: {step.command}")
+        started = time.time()
+        output_bytes = {"stdout": 0, "stderr": 0}
+        returncode = -1
+        try:
+            returncode = asyncio.run(self.stream_command(step.command, job.cwd, step.extra_env, job, output_bytes))
+        finally:
+            elapsed = time.monotonic() - step.started
+            self.record_history(job, step, started, elapsed, returncode, output_bytes)
+        if returncode == 0:
+            self.log_message(f"[{job.name}] 命令 '{step.command}' 执行成功，用时 {elapsed:.1f}s")
+        elif job.cancelled.is_set():
+            self.log_message(f"[{job.name}] 命令 '{step.command}' 已取消")
+        else:
+            self.log_message(f"[{job.name}] 命令执行失败，返回码: {returncode}，后续步骤不再执行")
+        return returncode
+        
+    def on_job_update(self, job):
+        """任务状态变化（可能来自调度线程），在主线程中刷新任务面板"""
+        self.call_in_ui(self.render_job, job)
+        
+    def render_job(self, job):
+        item = f"job{job.id}"
+        if not self.jobs_tree.exists(item):
+            self.jobs_tree.insert("", tk.END, iid=item, text=job.name, open=True)
+            for index, step in enumerate(job.steps):
+                self.jobs_tree.insert(item, tk.END, iid=f"{item}.{index}", text=step.label)
+        total = sum(step.elapsed or 0 for step in job.steps)
+        self.jobs_tree.item(item, values=(job.status, f"{total:.1f}s" if total else ""))
+        for index, step in enumerate(job.steps):
+            self.jobs_tree.item(f"{item}.{index}", values=(step.status, step.elapsed_text()))
+            
+    def tick_jobs(self):
+        """刷新正在运行的步骤的用时"""
+        for job in self.jobs.values():
+            if job.status == "运行中":
+                self.render_job(job)
+        self.root.after(JOB_TICK_MS, self.tick_jobs)
+        
+    def selected_job(self):
+        selection = self.jobs_tree.selection()
+        if not selection:
+            return None
+        job_id = int(selection[0].split(".")[0][len("job"):])
+        return self.jobs.get(job_id)
+        
+    def cancel_selected_job(self):
+        """取消选中的任务（排队中的任务直接取消，运行中的任务结束当前命令）"""
+        job = self.selected_job()
+        if job is None:
+            self.log_message("请先在任务队列中选择任务")
+            return
+        if job.status in ("等待中", "运行中"):
+            job.cancel()
+            self.log_message(f"正在取消任务: {job.name}")
+            
+    def clear_finished_jobs(self):
+        """从任务面板中移除已结束的任务"""
+        for job_id, job in list(self.jobs.items()):
+            if job.status not in ("等待中", "运行中"):
+                self.jobs_tree.delete(f"job{job_id}")
+                del self.jobs[job_id]
+        
+    def open_history(self):
+        """打开命令历史数据库，失败时只记录日志，不影响命令执行"""
+        try:
+            return CommandHistory()
+        except (sqlite3.Error, OSError) as e:
+            self.log_message(f"无法打开命令历史数据库: {str(e)}")
+            return None
+            
+    def record_history(self, job, step, started, elapsed, returncode, output_bytes):
+        """记录一次命令执行（在调度线程中调用），并刷新统计面板"""
+        if self.history is None:
+            return
+        try:
+            self.history.record(
+                step.command, job.cwd, started, elapsed, returncode,
+                output_bytes["stdout"], output_bytes["stderr"], job.cancelled.is_set()
+            )
+        except sqlite3.Error as e:
+            self.log_message(f"写入命令历史失败: {str(e)}")
+            return
+        self.call_in_ui(self.refresh_command_stats)
+        
+    def refresh_command_stats(self):
+        """在后台查询命令历史，在主线程中更新统计面板"""
+        if self.history is None:
+            return
+        project = self.project_path.get() if self.history_project_only.get() else None
+        
+        def query():
+            try:
+                stats = self.history.stats(project or None)
+            except sqlite3.Error as e:
+                self.log_message(f"读取命令历史失败: {str(e)}")
+                return
+            self.call_in_ui(self.show_command_stats, stats)
+            
+        threading.Thread(target=query, daemon=True).start()
+        
+    def show_command_stats(self, stats):
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        for entry in stats:
+            self.stats_tree.insert("", tk.END, text=entry["command"], values=(
+                entry["runs"],
+                entry["failures"],
+                format_seconds(entry["p50"]),
+                format_seconds(entry["p95"]),
+                format_seconds(entry["last"]),
+                format_trend(entry["trend"]),
+                entry["spark"],
+            ))
+            
+    async def stream_command(self, command, cwd, extra_env=None, job=None, output_bytes=None):
+        """用 asyncio 同时读取子进程的两个输出管道，返回退出码；output_bytes 中累计两个管道的输出字节数"""
+        # 设置环境变量以支持UTF-8
+        my_env = os.environ.copy()
+        my_env["PYTHONIOENCODING"] = "utf-8"
+        if extra_env:
+            my_env.update(extra_env)
+        
+        kwargs = {}
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+            kwargs['startupinfo'] = startupinfo
+        else:
+            # 独立进程组，取消时可以结束 shell 启动的所有子进程
+            kwargs['start_new_session'] = True
+        
+        process = await asyncio.create_subprocess_shell(
+            command,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=my_env,
+            **kwargs
+        )
+        if job is not None:
+            job.pid = process.pid
+            if job.cancelled.is_set():
+                kill_process_tree(process.pid)
+        stdout_bytes, stderr_bytes = await asyncio.gather(
+            self.pump_stream(process.stdout, ""),
+            self.pump_stream(process.stderr, "错误: "),
+        )
+        if output_bytes is not None:
+            output_bytes["stdout"] += stdout_bytes
+            output_bytes["stderr"] += stderr_bytes
+        return await process.wait()
+        
+    async def pump_stream(self, stream, prefix):
+        """按行转发输出；git 的进度信息用 \\r 分隔，也按行处理。返回读取的字节数"""
+        # 增量解码：多字节字符可能被拆在两次读取之间
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ""
+        total = 0
+        while True:
+            chunk = await stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            pending += decoder.decode(chunk)
+            lines = pending.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    self.log_message(f"{prefix}{line.rstrip()}")
+        pending += decoder.decode(b"", final=True)
+        if pending.strip():
+            self.log_message(f"{prefix}{pending.rstrip()}")
+        return total
         
     def git_commit(self):
         """Git提交"""
-        commit_message = tk.simpledialog.askstring("Git Commit", "请输入提交信息:")
+        commit_message = simpledialog.askstring("Git Commit", "请输入提交信息:")
         if commit_message:
             self.run_command(f'git commit -m "{commit_message}"')
             
     def log_message(self, message):
-        """向控制台输出信息"""
-        self.console.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n")
-        self.console.see(tk.END)
+        """向控制台输出信息（线程安全，实际写入由主线程完成）"""
+        self.log_queue.put(f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n")
+        
+    def call_in_ui(self, func, *args):
+        """从工作线程请求在 Tk 主线程中执行 func(*args)"""
+        self.ui_queue.put((func, args))
+        
+    def setup_file_logger(self):
+        """创建写入轮转日志文件的 logger，失败时只使用控制台"""
+        logger = logging.getLogger("bloghelper")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        except OSError:
+            return None
+        # 每一批日志作为一条记录写入，行尾已经带有换行符
+        handler.terminator = ""
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        return logger
+        
+    def drain_log_queue(self):
+        """在 Tk 主循环中批量取出日志并一次性写入控制台"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                func(*args)
+        except queue.Empty:
+            pass
+        
+        lines = []
+        try:
+            while True:
+                lines.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if lines:
+            if self.file_logger:
+                self.file_logger.info("".join(lines))
+            self.append_console(lines[-CONSOLE_MAX_LINES:])
+        self.root.after(LOG_POLL_MS, self.drain_log_queue)
+        
+    def append_console(self, lines):
+        """写入控制台，超过行数上限时批量删除最早的内容"""
+        at_bottom = self.console.yview()[1] >= 0.999
+        self.console.insert(tk.END, "".join(lines))
+        line_count = int(self.console.index("end-1c").split(".")[0])
+        if line_count > CONSOLE_MAX_LINES:
+            excess = line_count - (CONSOLE_MAX_LINES - CONSOLE_TRIM_LINES)
+            self.console.delete("1.0", f"{excess + 1}.0")
+        # 用户向上翻看历史时不自动滚动
+        if at_bottom:
+            self.console.see(tk.END)
+            
+    def search_log(self):
+        """在磁盘日志中搜索包含关键字的行，结果显示在新窗口中"""
+        keyword = self.search_text.get().strip()
+        if not keyword:
+            return
+        if not self.file_logger:
+            self.log_message("日志文件不可用，无法搜索")
+            return
+        for handler in self.file_logger.handlers:
+            handler.flush()
+            
+        def search():
+            # 从最旧的轮转文件开始，保证结果按时间顺序排列
+            files = [f"{LOG_FILE}.{n}" for n in range(LOG_BACKUP_COUNT, 0, -1)] + [LOG_FILE]
+            needle = keyword.lower()
+            results = deque(maxlen=SEARCH_MAX_RESULTS)
+            total = 0
+            for path in files:
+                try:
+                    with open(path, "r", encoding="utf-8", errors="replace") as f:
+                        for line in f:
+                            if needle in line.lower():
+                                total += 1
+                                results.append(line)
+                except FileNotFoundError:
+                    continue
+            self.call_in_ui(self.show_search_results, keyword, list(results), total)
+            
+        threading.Thread(target=search, daemon=True).start()
+        
+    def show_search_results(self, keyword, results, total):
+        """显示日志搜索结果"""
+        window = tk.Toplevel(self.root)
+        window.title(f"日志搜索: {keyword}")
+        window.geometry("800x500")
+        summary = f"共 {total} 条匹配"
+        if total > len(results):
+            summary += f"，只显示最近的 {len(results)} 条"
+        ttk.Label(window, text=summary).pack(anchor=tk.W, padx=5, pady=2)
+        text = scrolledtext.ScrolledText(window)
+        text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        text.insert(tk.END, "".join(results))
+        text.see(tk.END)
         
 def main():
     root = TkinterDnD.Tk()  # 使用支持拖放的Tk
@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import shlex
+import sqlite3
+import argparse
+from datetime import datetime
+
+# 命令执行历史：每条命令的开始时间、耗时、退出码、输出字节数和项目路径，保存在本地 SQLite 中
+HISTORY_DB = os.path.join(os.path.expanduser("~"), ".bloghelper", "history.sqlite3")
+# 趋势比较最近 N 次与之前 N 次成功执行的中位数
+TREND_WINDOW = 10
+# 耗时走势图显示的最近执行次数
+SPARK_RUNS = 20
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    command_key TEXT NOT NULL,
+    command TEXT NOT NULL,
+    project TEXT NOT NULL,
+    exit_code INTEGER,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    stdout_bytes INTEGER NOT NULL DEFAULT 0,
+    stderr_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS commands_key_started ON commands (command_key, started);
+"""
+
+def command_key(command):
+    """把命令归类用于统计：git 和 npm 取子命令，python 脚本取脚本名，忽略提交信息、分支等参数"""
+    try:
+        tokens = shlex.split(command, posix=os.name != 'nt')
+    except ValueError:
+        tokens = command.split()
+    tokens = [token.strip('"\'') for token in tokens]
+    if not tokens:
+        return command
+    program = os.path.basename(tokens[0]).lower()
+    if program.endswith(".exe"):
+        program = program[:-len(".exe")]
+    args = [token for token in tokens[1:] if not token.startswith("-")]
+    if program.startswith("python") and args:
+        return os.path.basename(args[0])
+    if program in ("npm", "pnpm", "yarn") and args:
+        if args[0] == "run" and len(args) > 1:
+            return f"{program} run {args[1]}"
+        return f"{program} {args[0]}"
+    if program == "git" and args:
+        return f"git {args[0]}"
+    return program
+
+def percentile(values, q):
+    """线性插值的百分位数，values 需已排序"""
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def sparkline(values):
+    """用方块字符画出耗时走势"""
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[round((value - low) * scale)] for value in values)
+
+class CommandHistory:
+    """命令执行历史，每次操作使用独立的连接，可以在任意线程中调用"""
+    def __init__(self, db_path=HISTORY_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, command, project, started, duration, exit_code,
+               stdout_bytes=0, stderr_bytes=0, cancelled=False):
+        """记录一次命令执行"""
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT INTO commands (started, duration, command_key, command, project, exit_code,"
+                " cancelled, stdout_bytes, stderr_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started, duration, command_key(command), command, project, exit_code,
+                 int(cancelled), stdout_bytes, stderr_bytes),
+            )
+
+    def query(self, project=None, days=None):
+        conditions = []
+        params = []
+        if project:
+            conditions.append("project = ?")
+            params.append(project)
+        if days:
+            conditions.append("started >= ?")
+            params.append(time.time() - days * 86400)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.connect() as conn:
+            return conn.execute(f"SELECT * FROM commands {where} ORDER BY started", params).fetchall()
+
+    def stats(self, project=None, days=None):
+        """按命令归类统计：执行次数、失败次数、成功执行耗时的 p50/p95、最近一次耗时和趋势
+        
+        trend 为最近 TREND_WINDOW 次与之前 TREND_WINDOW 次成功执行的中位数之比减一，次数不足时为 None。
+        """
+        groups = {}
+        for row in self.query(project, days):
+            groups.setdefault(row["command_key"], []).append(row)
+        
+        result = []
+        for key, rows in groups.items():
+            durations = [row["duration"] for row in rows if row["exit_code"] == 0]
+            ordered = sorted(durations)
+            recent = durations[-TREND_WINDOW:]
+            previous = durations[-2 * TREND_WINDOW:-TREND_WINDOW]
+            trend = None
+            if len(previous) >= TREND_WINDOW // 2:
+                trend = percentile(sorted(recent), 0.5) / percentile(sorted(previous), 0.5) - 1
+            result.append({
+                "command": key,
+                "runs": len(rows),
+                "failures": sum(1 for row in rows if row["exit_code"] != 0 and not row["cancelled"]),
+                "cancelled": sum(1 for row in rows if row["cancelled"]),
+                "p50": percentile(ordered, 0.5),
+                "p95": percentile(ordered, 0.95),
+                "last": rows[-1]["duration"],
+                "last_started": rows[-1]["started"],
+                "trend": trend,
+                "spark": sparkline(durations[-SPARK_RUNS:]),
+            })
+        return sorted(result, key=lambda entry: -entry["last_started"])
+
+    def recent(self, limit=20, project=None):
+        with self.connect() as conn:
+            if project:
+                rows = conn.execute(
+                    "SELECT * FROM commands WHERE project = ? ORDER BY started DESC LIMIT ?", (project, limit)
+                )
+            else:
+                rows = conn.execute("SELECT * FROM commands ORDER BY started DESC LIMIT ?", (limit,))
+            return rows.fetchall()
+
+def format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.1f}s"
+
+def format_trend(trend):
+    return "-" if trend is None else f"{trend * 100:+.0f}%"
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="命令执行历史与耗时统计")
+    parser.add_argument("--db", default=HISTORY_DB, help="历史数据库路径")
+    parser.add_argument("--project", help="只统计指定项目路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="按命令统计 p50/p95 耗时和趋势")
+    stats_parser.add_argument("--days", type=float, help="只统计最近 N 天")
+    recent_parser = subparsers.add_parser("recent", help="列出最近执行的命令")
+    recent_parser.add_argument("-n", type=int, default=20, help="显示条数（默认 20）")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    history = CommandHistory(args.db)
+    if args.command == "stats":
+        print(f"{'command':24} {'runs':>5} {'fail':>5} {'p50':>8} {'p95':>8} {'last':>8} {'trend':>6}  history")
+        for entry in history.stats(args.project, args.days):
+            print(f"{entry['command'][:24]:24} {entry['runs']:>5} {entry['failures']:>5} "
+                  f"{format_seconds(entry['p50']):>8} {format_seconds(entry['p95']):>8} "
+                  f"{format_seconds(entry['last']):>8} {format_trend(entry['trend']):>6}  {entry['spark']}")
+    elif args.command == "recent":
+        for row in history.recent(args.n, args.project):
+            started = datetime.fromtimestamp(row["started"]).strftime("%Y-%m-%d %H:%M:%S")
+            status = "cancelled" if row["cancelled"] else f"exit {row['exit_code']}"
+            print(f"{started}  {format_seconds(row['duration']):>8}  {status:>9}  "
+                  f"{row['stdout_bytes']:>8}B out {row['stderr_bytes']:>7}B err  {row['command']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
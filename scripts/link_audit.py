@@ -0,0 +1,323 @@
+import re
+import ssl
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from urllib.parse import urlsplit, urljoin, quote
+import frontmatter
+import process_build
+
+# 检查文章中的下载链接是否仍然有效（包括已加密的链接）
+# 使用 asyncio 流实现的 HTTP/1.1 客户端：同一主机复用连接，并限制每个主机的并发数
+
+# 检查结果缓存，有效期内的链接不再请求
+AUDIT_CACHE_FILE = process_build.BUILD_CACHE_DIR / 'link_audit.json'
+DEFAULT_TTL_HOURS = 24
+DEFAULT_CONCURRENCY = 32
+DEFAULT_PER_HOST = 4
+DEFAULT_TIMEOUT = 10.0
+MAX_REDIRECTS = 5
+# 响应体不超过该大小时读完并复用连接，否则关闭连接
+MAX_DRAIN_BYTES = 64 * 1024
+USER_AGENT = 'Mozilla/5.0 (compatible; blog-link-audit/1.0)'
+ENCRYPTED_PREFIX = 'encrypted:'
+BARE_URL_RE = re.compile(r'https?://[^\s<>()\[\]"\'`提取码]+')
+# 链接末尾的标点通常不是地址的一部分
+TRAILING_PUNCTUATION = '.,;:!?。，；：！？、'
+# 链接之后同一行内的提取码
+CODE_WINDOW = 40
+
+def clean_url(url: str) -> str:
+    return url.strip().rstrip(TRAILING_PUNCTUATION)
+
+def extract_links(content: str, key: bytes) -> list:
+    """返回文章中的所有网页链接 [{'url', 'code', 'encrypted'}]，加密链接先解密"""
+    links = []
+    pieces = []
+    pos = 0
+    for start, end, text, url in process_build.iter_markdown_links(content):
+        pieces.append(content[pos:start])
+        pos = end
+        line_rest = content[end:end + CODE_WINDOW].split('\n', 1)[0]
+        match = process_build.EXTRACT_CODE_RE.search(text) or process_build.EXTRACT_CODE_RE.search(line_rest)
+        code = match.group(1) if match else None
+        if url.startswith(ENCRYPTED_PREFIX):
+            try:
+                url = process_build.decrypt_url(url[len(ENCRYPTED_PREFIX):], key)
+            except Exception:
+                links.append({'url': None, 'code': code, 'encrypted': True, 'error': 'cannot decrypt'})
+                continue
+            encrypted = True
+        else:
+            encrypted = False
+        url = clean_url(url)
+        if url.startswith(('http://', 'https://')):
+            links.append({'url': url, 'code': code, 'encrypted': encrypted})
+    pieces.append(content[pos:])
+    # 没有写成 [文本](链接) 的裸链接
+    for match in BARE_URL_RE.finditer(''.join(pieces)):
+        links.append({'url': clean_url(match.group(0)), 'code': None, 'encrypted': False})
+    return links
+
+def collect_post_links(root: Path, key: bytes) -> dict:
+    """收集每篇文章中的链接 {文章相对路径: [链接]}"""
+    src_dir = root / process_build.SRC_POSTS_DIR
+    posts = {}
+    for markdown_file in process_build.collect_markdown_files(root):
+        post = frontmatter.loads(process_build.decode_text(markdown_file.read_bytes()))
+        links = extract_links(post.content, key)
+        if links:
+            posts[markdown_file.relative_to(src_dir).as_posix()] = links
+    return posts
+
+class HttpError(Exception):
+    """连接失败、超时或响应格式错误"""
+
+class LinkChecker:
+    """带连接池的 HTTP 检查器：每个主机最多 per_host 个并发请求，空闲连接保留复用"""
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT):
+        self.limit = asyncio.Semaphore(concurrency)
+        self.per_host = per_host
+        self.timeout = timeout
+        self.host_limits = {}
+        self.idle = {}
+        self.ssl_context = ssl.create_default_context()
+        self.stats = {'requests': 0, 'connections': 0, 'reused': 0}
+
+    def host_limit(self, origin):
+        if origin not in self.host_limits:
+            self.host_limits[origin] = asyncio.Semaphore(self.per_host)
+        return self.host_limits[origin]
+
+    async def open_connection(self, origin):
+        scheme, host, port = origin
+        self.stats['connections'] += 1
+        return await asyncio.open_connection(
+            host, port,
+            ssl=self.ssl_context if scheme == 'https' else None,
+            server_hostname=host if scheme == 'https' else None,
+        )
+
+    async def request(self, method: str, url: str):
+        """发送一个请求，返回 (状态码, 响应头)"""
+        parts = urlsplit(url)
+        if not parts.hostname:
+            raise HttpError('invalid url')
+        host = parts.hostname.encode('idna').decode('ascii')
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        origin = (parts.scheme, host, port)
+        path = quote(parts.path or '/', safe="/%:@!$&'()*+,;=-._~")
+        if parts.query:
+            path += '?' + quote(parts.query, safe="/%:@!$&'()*+,;=-._~?")
+        host_header = host if parts.port is None else f'{host}:{port}'
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {host_header}',
+            f'User-Agent: {USER_AGENT}',
+            'Accept: */*',
+            'Connection: keep-alive',
+        ]
+        if method == 'GET':
+            lines.append('Range: bytes=0-0')
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('ascii')
+        
+        # 先等待主机的名额再占用全局名额，同一主机排队的请求不会占满全局并发
+        async with self.host_limit(origin), self.limit:
+            idle = self.idle.setdefault(origin, [])
+            # 复用的连接可能已被服务器关闭，失败时换新连接重试一次
+            for attempt in range(2):
+                reused = bool(idle) and attempt == 0
+                reader, writer = idle.pop() if reused else await asyncio.wait_for(
+                    self.open_connection(origin), self.timeout
+                )
+                try:
+                    writer.write(payload)
+                    await writer.drain()
+                    status, headers, keep_alive = await asyncio.wait_for(
+                        self.read_response(reader, method), self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError, HttpError) as e:
+                    writer.close()
+                    if reused:
+                        continue
+                    raise HttpError(str(e) or type(e).__name__)
+                except BaseException:
+                    writer.close()
+                    raise
+                self.stats['requests'] += 1
+                self.stats['reused'] += reused
+                if keep_alive:
+                    idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, headers
+
+    async def read_response(self, reader, method: str):
+        """读取状态行和响应头，读完较小的响应体以便复用连接"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise HttpError('connection closed')
+        try:
+            version, status = status_line.decode('latin-1').split()[:2]
+            status = int(status)
+        except ValueError:
+            raise HttpError(f'bad status line: {status_line[:80]!r}')
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return status, headers, keep_alive
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            drained = 0
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                drained += size
+                if drained > MAX_DRAIN_BYTES:
+                    return status, headers, False
+                await reader.readexactly(size + 2)
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length > MAX_DRAIN_BYTES:
+                return status, headers, False
+            await reader.readexactly(length)
+        else:
+            keep_alive = False
+        return status, headers, keep_alive
+
+    async def check(self, url: str) -> dict:
+        """检查一个链接，跟随重定向；部分服务器不支持 HEAD，此时改用 GET"""
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                status, headers = await self.request('HEAD', url)
+                if status in (403, 405, 501):
+                    status, headers = await self.request('GET', url)
+                if 300 <= status < 400 and headers.get('location'):
+                    url = urljoin(url, headers['location'])
+                    continue
+                return {'status': status, 'ok': status < 400, 'final_url': url}
+            return {'status': None, 'ok': False, 'error': 'too many redirects', 'final_url': url}
+        except (HttpError, OSError, asyncio.TimeoutError, UnicodeError) as e:
+            return {'status': None, 'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+    async def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle.clear()
+
+def load_audit_cache(cache_file: Path) -> dict:
+    """读取检查结果缓存，不存在或损坏时返回空缓存"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            links = json.load(f).get('links')
+    except (OSError, ValueError, AttributeError):
+        return {}
+    return links if isinstance(links, dict) else {}
+
+async def check_links(urls, checker: LinkChecker, progress_every: int = 50) -> dict:
+    """并发检查所有链接，返回 {链接: 结果}"""
+    results = {}
+
+    async def run(url):
+        results[url] = dict(await checker.check(url), checked=time.time())
+        if len(results) % progress_every == 0 or len(results) == len(urls):
+            print(f'[{len(results)}/{len(urls)}] checked')
+
+    try:
+        await asyncio.gather(*(run(url) for url in urls))
+    finally:
+        await checker.close()
+    return results
+
+def audit(root: Path, key: bytes, ttl_hours: float = DEFAULT_TTL_HOURS, concurrency: int = DEFAULT_CONCURRENCY,
+          per_host: int = DEFAULT_PER_HOST, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """收集、去重并检查所有链接，返回逐篇文章的报告"""
+    root = Path(root).resolve()
+    posts = collect_post_links(root, key)
+    cache_file = root / AUDIT_CACHE_FILE
+    cache = load_audit_cache(cache_file)
+    now = time.time()
+    
+    urls = sorted({link['url'] for links in posts.values() for link in links if link['url']})
+    stale = [url for url in urls if now - cache.get(url, {}).get('checked', 0) > ttl_hours * 3600]
+    hosts = {}
+    for url in stale:
+        host = urlsplit(url).hostname or ''
+        hosts[host] = hosts.get(host, 0) + 1
+    print(f'{len(urls)} unique link(s) in {len(posts)} post(s), {len(stale)} to check '
+          f'across {len(hosts)} host(s), {len(urls) - len(stale)} cached')
+    
+    stats = {}
+    if stale:
+        checker = LinkChecker(concurrency, per_host, timeout)
+        cache.update(asyncio.run(check_links(stale, checker)))
+        stats = checker.stats
+    # 只保留仍在文章中出现的链接
+    cache = {url: cache[url] for url in urls if url in cache}
+    process_build.save_manifest({'links': cache}, cache_file)
+    
+    report = {'generated': now, 'posts': {}, 'summary': {'posts': len(posts), 'links': len(urls), 'dead': 0}}
+    dead_urls = set()
+    for rel_name, links in sorted(posts.items()):
+        entries = []
+        for link in links:
+            result = cache.get(link['url'], {'ok': False, 'status': None, 'error': link.get('error')})
+            entries.append(dict(link, **result))
+            if not result['ok']:
+                dead_urls.add(link['url'])
+        report['posts'][rel_name] = entries
+    report['summary']['dead'] = len(dead_urls)
+    report['summary']['requests'] = stats
+    return report
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='检查文章中的链接（包括加密链接）是否仍然有效')
+    parser.add_argument('--root', default='.', help='项目根目录（默认为当前目录）')
+    parser.add_argument('--password-file', help='加密密码文件（默认与构建相同：环境变量或内置密码）')
+    parser.add_argument('--output', default='link-audit.json', help='报告文件（默认 link-audit.json）')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL_HOURS, help='检查结果的缓存时间（小时，0 表示全部重新检查）')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='同时进行的请求总数')
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, help='每个主机同时进行的请求数')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='单个请求的超时时间（秒）')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.per_host < 1:
+        parser.error('--concurrency and --per-host must be >= 1')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        key = process_build.generate_key(process_build.read_password(args.password_file))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    report = audit(Path(args.root), key, args.ttl, args.concurrency, args.per_host, args.timeout)
+    
+    for rel_name, entries in report['posts'].items():
+        dead = [entry for entry in entries if not entry['ok']]
+        if dead:
+            print(f"\n{rel_name}:")
+            for entry in dead:
+                reason = entry.get('status') or entry.get('error')
+                print(f"  {reason}  {entry['url'] or '(encrypted)'}")
+    process_build.save_manifest(report, Path(args.output))
+    summary = report['summary']
+    print(f"\nLink audit: {summary['links']} link(s) in {summary['posts']} post(s), {summary['dead']} dead. "
+          f"Report written to {args.output}")
+    return 1 if summary['dead'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import os
+import stat
+import shutil
+import zipfile
+import posixpath
+
+# 解压时每次读写的字节数
+CHUNK_SIZE = 1024 * 1024
+# 单个压缩包的限制，防止损坏或恶意的压缩包占满磁盘
+MAX_ARCHIVE_BYTES = 2 * 1024 * 1024 * 1024
+MAX_ARCHIVE_FILES = 10000
+# 压缩比超过该值的大文件视为压缩炸弹
+MAX_COMPRESSION_RATIO = 100
+MIN_RATIO_CHECK_BYTES = 1024 * 1024
+# 解压后至少保留的磁盘空间
+MIN_FREE_BYTES = 256 * 1024 * 1024
+
+class ArchiveError(Exception):
+    """压缩包不合法或超出限制"""
+
+class ImportCancelled(Exception):
+    """导入被用户取消"""
+
+def safe_member_path(name: str) -> str:
+    """检查压缩包内的路径，返回规范化后的相对路径，拒绝绝对路径和 .. 路径（zip-slip）"""
+    normalized = name.replace('\\', '/')
+    if normalized.startswith('/') or (len(normalized) > 1 and normalized[1] == ':'):
+        raise ArchiveError(f"压缩包包含绝对路径: {name}")
+    normalized = posixpath.normpath(normalized)
+    if normalized == '..' or normalized.startswith('../'):
+        raise ArchiveError(f"压缩包包含越界路径: {name}")
+    return normalized
+
+def check_archive(zip_ref: zipfile.ZipFile, dest_dir: str,
+                  max_bytes: int = MAX_ARCHIVE_BYTES, max_files: int = MAX_ARCHIVE_FILES) -> list:
+    """解压前检查所有成员，返回需要解压的文件 [(ZipInfo, 相对路径)]"""
+    infos = zip_ref.infolist()
+    if len(infos) > max_files:
+        raise ArchiveError(f"压缩包文件数量过多: {len(infos)} > {max_files}")
+
+    members = []
+    total = 0
+    for info in infos:
+        rel_path = safe_member_path(info.filename)
+        if info.is_dir() or rel_path == '.':
+            continue
+        mode = info.external_attr >> 16
+        if stat.S_ISLNK(mode):
+            raise ArchiveError(f"压缩包包含符号链接: {info.filename}")
+        if info.file_size >= MIN_RATIO_CHECK_BYTES and info.file_size > info.compress_size * MAX_COMPRESSION_RATIO:
+            raise ArchiveError(f"压缩比异常，疑似压缩炸弹: {info.filename}")
+        total += info.file_size
+        members.append((info, rel_path))
+
+    if total > max_bytes:
+        raise ArchiveError(f"解压后大小超出限制: {total} > {max_bytes} 字节")
+    free = shutil.disk_usage(dest_dir).free
+    if total + MIN_FREE_BYTES > free:
+        raise ArchiveError(f"磁盘空间不足: 需要 {total} 字节，剩余 {free} 字节")
+    return members
+
+def extract_archive(zip_path: str, dest_dir: str, backup_store=None, progress=None,
+                    cancel_event=None, max_bytes: int = MAX_ARCHIVE_BYTES) -> dict:
+    """逐个成员流式解压到 dest_dir，可选同时写入备份库 backup_store
+
+    备份直接使用解压时已经读出的数据，不再对解压结果做第二遍复制；
+    返回结果中的 entries 为 {相对路径: {'hash', 'size'}}，用于保存导入清单。
+    progress(已写入字节数, 总字节数, 当前文件) 在每个数据块后调用；
+    cancel_event 被设置时抛出 ImportCancelled。失败或取消时删除已解压的内容。
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    entries = {}
+
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            members = check_archive(zip_ref, dest_dir, max_bytes)
+            total = sum(info.file_size for info, _ in members)
+            written = 0
+            for info, rel_path in members:
+                target = os.path.join(dest_dir, rel_path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+
+                member_written = 0
+                with zip_ref.open(info) as src:
+                    outputs = [open(target, 'wb')]
+                    blob = backup_store.blob_writer() if backup_store is not None else None
+                    if blob is not None:
+                        outputs.append(blob)
+                    try:
+                        while True:
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise ImportCancelled()
+                            chunk = src.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            member_written += len(chunk)
+                            written += len(chunk)
+                            # 声明的大小可能是伪造的，按实际写入量再检查一次
+                            if member_written > info.file_size or written > max_bytes:
+                                raise ArchiveError(f"文件实际大小超出声明: {info.filename}")
+                            for output in outputs:
+                                output.write(chunk)
+                            if progress is not None:
+                                progress(written, total, rel_path)
+                    except BaseException:
+                        if blob is not None:
+                            blob.discard()
+                        raise
+                    finally:
+                        outputs[0].close()
+                if blob is not None:
+                    entries[rel_path] = {'hash': blob.commit(), 'size': member_written}
+    except BaseException:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        raise
+    return {'files': len(members), 'bytes': written, 'entries': entries}
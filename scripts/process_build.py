@@ -1,12 +1,39 @@
 import os
+import io
 import re
+import sys
+import json
+import gzip
+import time
+import queue
+import argparse
+import threading
+import contextlib
 import shutil
+import hashlib
+import unicodedata
 from pathlib import Path
 import base64
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from collections import ChainMap
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，reflink 自动退回普通复制
+    fcntl = None
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import frontmatter
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 未安装 Pillow 时跳过图片优化
+    Image = ImageOps = None
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # 未安装 watchdog 时监视模式退回轮询
+    Observer = FileSystemEventHandler = None
 
 # 白名单配置 - 使用更精确的路径格式
 WHITELIST_FOLDERS = [
@@ -16,32 +43,103 @@ WHITELIST_FOLDERS = [
     'src/posts/broadcast/index.md',
 ]
 
+# 加密密码：默认值，可以用环境变量 BLOG_PASSWORD 或 --password-file 覆盖（更换密码见 rekey_posts.py）
+PASSWORD = "suxingchahui"
+PASSWORD_ENV = 'BLOG_PASSWORD'
+KEY_SALT = b'static_salt_for_blog'
+
+# 源文章目录与图片输出目录（相对于项目根目录）
+SRC_POSTS_DIR = Path('src/posts')
+PUBLIC_POSTS_DIR = Path('public/src/posts')
+
+# 增量构建清单 - 记录每个文件处理后的内容哈希
+BUILD_CACHE_DIR = Path('.build_cache')
+MANIFEST_FILE = BUILD_CACHE_DIR / 'manifest.json'
+# 链接密文缓存 - 同一密钥下同一链接始终使用同一个密文
+LINK_CACHE_FILE = BUILD_CACHE_DIR / 'link_cache.json'
+# 处理逻辑版本号，修改 process_markdown_content 的输出时需要递增，使旧记录失效
+PROCESS_VERSION = 1
+
+# 文章索引输出目录（public 下的文件会原样复制到站点根目录）
+POST_INDEX_DIR = Path('public/post-index')
+POST_INDEX_FILE = 'index.json.gz'
+POST_INDEX_YEARS_FILE = 'years.json.gz'
+# 文章索引格式版本号，修改字段时递增，前端据此判断能否读取
+POST_INDEX_VERSION = 1
+
+# 全文搜索索引：词项按前缀分片，浏览器只下载查询需要的分片
+SEARCH_INDEX_DIR = Path('public/search-index')
+SEARCH_DOCS_FILE = 'docs.json.gz'
+# 每篇文章分词结果的缓存，文件哈希不变时不重新读取和分词
+SEARCH_TERMS_CACHE = BUILD_CACHE_DIR / 'search_terms.json'
+# 搜索索引格式版本号，修改分词或分片规则时递增
+SEARCH_INDEX_VERSION = 1
+# 非 ASCII 词项按首字符码位分块，每块 2**SEARCH_SHARD_BITS 个码位
+SEARCH_SHARD_BITS = 6
+# 英文单词的长度范围，过短或过长的词不建索引
+MIN_WORD_LENGTH = 2
+MAX_WORD_LENGTH = 32
+
+# 监视模式：连续修改之间间隔小于该值（秒）时合并为一次处理；未安装 watchdog 时的轮询间隔
+WATCH_DEBOUNCE = 0.3
+WATCH_POLL_INTERVAL = 1.0
+
+# 构建报告中列出的最慢文件数量
+SLOWEST_FILES = 10
+
+# 安静模式下不输出逐文件的进度信息
+QUIET = False
+
+def log_detail(message: str):
+    """输出逐文件的进度信息，安静模式下忽略"""
+    if not QUIET:
+        print(message)
+
+def new_report() -> dict:
+    """创建构建报告，记录各阶段耗时和逐文件统计"""
+    return {'stages': {}, 'files': []}
+
+@contextlib.contextmanager
+def timed_stage(report, name: str):
+    """记录一个构建阶段的耗时（秒）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if report is not None:
+            report['stages'][name] = round(time.perf_counter() - start, 4)
+
 def is_whitelisted(file_path: Path) -> bool:
     """检查文件是否在白名单中"""
     str_path = str(file_path).replace('\\', '/')  # 统一使用正斜杠
     
-    # 打印调试信息
-    print(f"Checking path: {str_path}")
-    
     for white_path in WHITELIST_FOLDERS:
         if white_path.endswith('/'):
             # 如果是文件夹匹配
             if str_path.startswith(white_path):
-                print(f"Matched folder whitelist: {white_path}")
                 return True
         else:
             # 如果是具体文件匹配
             if str_path.endswith(white_path):
-                print(f"Matched file whitelist: {white_path}")
                 return True
     return False
+
+def read_password(password_file=None, env_var: str = PASSWORD_ENV, default=PASSWORD):
+    """读取加密密码：指定的密码文件优先，其次环境变量，最后使用默认密码"""
+    if password_file:
+        with open(password_file, 'r', encoding='utf-8') as f:
+            password = f.read().strip()
+        if not password:
+            raise ValueError(f'Password file is empty: {password_file}')
+        return password
+    return os.environ.get(env_var) or default
+
 def generate_key(password: str) -> bytes:
     """从密码生成加密密钥"""
-    salt = b'static_salt_for_blog'
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
-        salt=salt,
+        salt=KEY_SALT,
         iterations=100000,
     )
     return kdf.derive(password.encode())
@@ -54,128 +152,1436 @@ def encrypt_url(url: str, key: bytes) -> str:
     combined = nonce + ciphertext
     return base64.urlsafe_b64encode(combined).decode()
 
-def process_markdown_content(content: str, key: bytes) -> str:
-    """处理Markdown内容中的链接"""
-    processed_content = content
+def decrypt_url(encrypted: str, key: bytes) -> str:
+    """解密 encrypt_url 生成的密文，密钥不匹配或密文损坏时抛出异常"""
+    combined = base64.urlsafe_b64decode(encrypted)
+    return AESGCM(key).decrypt(combined[:12], combined[12:], None).decode()
+
+# 链接扫描使用的预编译正则，模块加载时编译一次
+IMAGE_EXTENSIONS = ('.webp', '.jpg', '.jpeg', '.png', '.gif', '.svg')
+EXTRACT_CODE_RE = re.compile(r'提取码[：:]\s*([A-Za-z0-9]{4,6})')
+# 一行中第一个纯文本链接的起点
+URL_START_RE = re.compile(r'https?://\S|magnet:\?\S')
+# 纯文本链接本身（https或magnet开头到空格或者"提取码"之前的部分）
+BARE_URL_RE = re.compile(r'https?://[^\s提取码]+|magnet:\?[^\s提取码]+')
+
+def key_fingerprint(key: bytes) -> str:
+    """密钥指纹，用于判断缓存是否由当前密钥生成（不泄露密钥本身）"""
+    return hashlib.sha256(b'blog-link-cache:' + key).hexdigest()[:16]
+
+def load_link_cache(key: bytes, cache_file: Path = LINK_CACHE_FILE) -> dict:
+    """读取链接密文缓存，密钥指纹不一致时缓存失效"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('key') != key_fingerprint(key) or not isinstance(cache.get('links'), dict):
+        return {}
+    return cache['links']
+
+def save_link_cache(links: dict, key: bytes, cache_file: Path = LINK_CACHE_FILE):
+    """写入链接密文缓存"""
+    save_manifest({'key': key_fingerprint(key), 'links': links}, cache_file)
+
+def encrypt_url_cached(url: str, key: bytes, link_cache=None) -> str:
+    """加密URL，优先使用缓存中的密文，保证重复构建输出一致"""
+    if link_cache is None:
+        return encrypt_url(url, key)
+    encrypted = link_cache.get(url)
+    if encrypted is None:
+        encrypted = link_cache[url] = encrypt_url(url, key)
+    return encrypted
+
+def encrypted_link(url: str, key: bytes, extract_code=None, link_cache=None) -> str:
+    """生成加密后的markdown链接"""
+    encrypted = encrypt_url_cached(url, key, link_cache)
+    if extract_code:
+        return f'[🔒 加密链接点击解密 提取码：{extract_code}](encrypted:{encrypted})'
+    return f'[🔒 加密链接点击解密](encrypted:{encrypted})'
+
+def iter_markdown_links(content: str):
+    """线性扫描 [text](url) 格式的链接，依次返回 (start, end, text, url)
+
+    匹配规则与 [文本](链接) 正则一致：文本和链接都不能为空，且不跨越 ']' 和 ')'。
+    这里缓存下一个 ']' 和 ')' 的位置，大量未闭合的括号不会导致反复回溯。
+    """
+    pos = 0
+    close_bracket = close_paren = -1
+    while True:
+        start = content.find('[', pos)
+        if start == -1:
+            return
+        if close_bracket <= start:
+            close_bracket = content.find(']', start + 1)
+            if close_bracket == -1:
+                return
+        if close_bracket == start + 1 or content[close_bracket + 1:close_bracket + 2] != '(':
+            pos = start + 1
+            continue
+        if close_paren <= close_bracket + 1:
+            close_paren = content.find(')', close_bracket + 2)
+            if close_paren == -1:
+                return
+        if close_paren == close_bracket + 2:
+            pos = start + 1
+            continue
+        yield start, close_paren + 1, content[start + 1:close_bracket], content[close_bracket + 2:close_paren]
+        pos = close_paren + 1
+
+def encrypt_markdown_link(text: str, url: str, key: bytes, link_cache=None):
+    """加密 [text](url) 链接，不需要加密时返回 None"""
+    # 如果是图片链接或已加密链接，直接返回原内容
+    if url.endswith(IMAGE_EXTENSIONS) or url.startswith('encrypted:'):
+        return None
     
-    # 1. 处理markdown格式的链接 [text](url)
-    link_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
+    # 如果是 http/https/magnet 链接，进行加密
+    if url.startswith(('http://', 'https://', 'magnet:')):
+        # 检查链接文本是否包含提取码
+        extract_code_match = EXTRACT_CODE_RE.search(text)
+        extract_code = extract_code_match.group(1) if extract_code_match else None
+        return encrypted_link(url, key, extract_code, link_cache)
+    return None
+
+def process_line(line: str, key: bytes, link_cache=None) -> str:
+    """处理一行纯文本中的url链接（在提取码之前的链接）
+
+    从行内第一个链接之前最后一个 '.' 之后到行尾视为一个文本块，
+    块内的提取码对块内所有链接生效。
+    """
+    url_start = URL_START_RE.search(line)
+    if url_start is None:
+        return line
     
-    def encrypt_link(match):
-        text = match.group(1)
-        url = match.group(2)
-        
-        # 如果是图片链接或已加密链接，直接返回原内容
-        if url.endswith(('.webp', '.jpg', '.jpeg', '.png', '.gif', '.svg')) or url.startswith('encrypted:'):
-            return match.group(0)
-            
-        # 如果是 http/https/magnet 链接，进行加密
-        if url.startswith(('http://', 'https://', 'magnet:')):
-            encrypted_url = encrypt_url(url, key)
-            # 检查链接文本是否包含提取码
-            extract_code_match = re.search(r'提取码[：:]\s*([A-Za-z0-9]{4,6})', text)
-            if extract_code_match:
-                extract_code = extract_code_match.group(1)
-                return f'[🔒 加密链接点击解密 提取码：{extract_code}](encrypted:{encrypted_url})'
-            return f'[🔒 加密链接点击解密](encrypted:{encrypted_url})'
-            
-        return match.group(0)
+    block_start = line.rfind('.', 0, url_start.start()) + 1
+    block = line[block_start:]
+    extract_code_match = EXTRACT_CODE_RE.search(block)
+    extract_code = extract_code_match.group(1) if extract_code_match else None
     
-    processed_content = re.sub(link_pattern, encrypt_link, processed_content)
+    def replace_url(url_match):
+        return encrypted_link(url_match.group(0), key, extract_code, link_cache)
     
-    # 2. 处理纯文本中的url链接（在提取码之前的链接）
-    def process_url_with_code(match):
-        full_text = match.group(0)
-        
-        # 先检查是否包含提取码
-        extract_code_match = re.search(r'提取码[：:]\s*([A-Za-z0-9]{4,6})', full_text)
-        extract_code = extract_code_match.group(1) if extract_code_match else None
-        
-        # 匹配链接部分（https或magnet开头到空格或者"提取码"之前的部分）
-        url_pattern = r'(https?://[^\s提取码]+|magnet:\?[^\s提取码]+)'
-        
-        def replace_url(url_match):
-            url = url_match.group(1)
-            encrypted_url = encrypt_url(url, key)
-            if extract_code:
-                return f'[🔒 加密链接点击解密 提取码：{extract_code}](encrypted:{encrypted_url})'
-            return f'[🔒 加密链接点击解密](encrypted:{encrypted_url})'
-        
-        return re.sub(url_pattern, replace_url, full_text)
+    return line[:block_start] + BARE_URL_RE.sub(replace_url, block)
+
+def process_markdown_content(content: str, key: bytes, link_cache=None) -> str:
+    """处理Markdown内容中的链接
+
+    一次线性扫描：先替换 [text](url) 链接，替换后的文本按行立即处理其中的纯文本链接。
+    传入 link_cache（url -> 密文）时复用已有密文，新加密的链接也会写入其中。
+    """
+    output_lines = []
+    current_line = []
+    
+    def feed(text: str):
+        parts = text.split('\n')
+        current_line.append(parts[0])
+        for part in parts[1:]:
+            output_lines.append(process_line(''.join(current_line), key, link_cache))
+            current_line[:] = [part]
+    
+    pos = 0
+    for start, end, text, url in iter_markdown_links(content):
+        replacement = encrypt_markdown_link(text, url, key, link_cache)
+        if replacement is None:
+            continue
+        feed(content[pos:start])
+        current_line.append(replacement)
+        pos = end
+    feed(content[pos:])
+    output_lines.append(process_line(''.join(current_line), key, link_cache))
+    
+    return '\n'.join(output_lines)
+
+# 字数统计：每个汉字计一个字，连续的字母数字计一个词；链接地址和加密密文不计入
+WORD_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]|[A-Za-z0-9]+(?:['’][A-Za-z]+)*")
+LINK_TARGET_RE = re.compile(r'\]\([^)]*\)')
+
+def as_list(value) -> list:
+    """frontmatter 中的标签、分类可以写成字符串或列表，统一为字符串列表"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item is not None and item != '']
+    return [str(value)]
+
+def post_metadata(post) -> dict:
+    """从处理后的文章中提取列表页需要的元数据（可以 JSON 序列化，存入构建清单）"""
+    date = post.get('date')
+    if hasattr(date, 'isoformat'):
+        date = date.isoformat()
+    cover = post.get('cover') or post.get('coverImage') or post.get('image')
+    if isinstance(cover, dict):
+        cover = cover.get('src')
+    categories = post.get('categories')
+    if categories is None:
+        categories = post.get('category')
+    meta = {
+        'title': str(post.get('title') or ''),
+        'date': str(date) if date else '',
+        'tags': as_list(post.get('tags')),
+        'categories': as_list(categories),
+        'words': len(WORD_RE.findall(LINK_TARGET_RE.sub(']', post.content))),
+        'cover': str(cover) if cover else '',
+    }
+    if post.get('slug'):
+        meta['slug'] = str(post['slug'])
+    return meta
+
+# 搜索分词：汉字按相邻两字切分，英文和数字按单词切分
+CJK_RUN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+LATIN_WORD_RE = re.compile(r'[a-z0-9]+')
+# 加密链接整体不参与搜索（提示文字在每篇文章中都一样，密文没有意义）
+ENCRYPTED_LINK_RE = re.compile(r'\[🔒 加密链接点击解密[^\]]*\]\(encrypted:[^)]*\)')
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+def search_terms(text: str) -> dict:
+    """对文章文本分词，返回 {词项: 出现次数}"""
+    text = ENCRYPTED_LINK_RE.sub(' ', text)
+    text = LINK_TARGET_RE.sub(']', text)
+    text = HTML_TAG_RE.sub(' ', text)
+    text = unicodedata.normalize('NFKC', text).lower()
+    terms = {}
+    for run in CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms[run] = terms.get(run, 0) + 1
+        for i in range(len(run) - 1):
+            bigram = run[i:i + 2]
+            terms[bigram] = terms.get(bigram, 0) + 1
+    for word in LATIN_WORD_RE.findall(CJK_RUN_RE.sub(' ', text)):
+        if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH:
+            terms[word] = terms.get(word, 0) + 1
+    return terms
+
+def search_shard(term: str) -> str:
+    """词项所在的分片名：ASCII 词项按首字母，其它按首字符的码位块（前端使用相同规则）"""
+    first = term[0]
+    if first.isascii():
+        return first
+    return f'u{ord(first) >> SEARCH_SHARD_BITS:x}'
+
+def post_slug(rel_name: str) -> str:
+    """由文章相对路径得到 slug：目录下的 index.md 使用目录名，其余使用不带扩展名的路径"""
+    path = rel_name[:-len('.md')] if rel_name.endswith('.md') else rel_name
+    if path.endswith('/index'):
+        path = path[:-len('/index')]
+    return path
+
+def file_hash(data: bytes) -> str:
+    """计算文件内容的哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+def load_manifest(manifest_file: Path = MANIFEST_FILE) -> dict:
+    """读取构建清单，不存在或损坏时返回空清单"""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+    if not isinstance(manifest.get('files'), dict):
+        return {'files': {}}
+    return manifest
+
+def save_manifest(manifest: dict, manifest_file: Path = MANIFEST_FILE):
+    """原子写入构建清单"""
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = manifest_file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+def is_up_to_date(entry, digest: str) -> bool:
+    """清单记录与当前文件哈希、处理版本一致时视为无需处理"""
+    return (
+        isinstance(entry, dict)
+        and entry.get('hash') == digest
+        and entry.get('version') == PROCESS_VERSION
+    )
+
+def decode_text(data: bytes) -> str:
+    """按文本模式读取文件内容（统一换行符）"""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def encode_text(text: str) -> bytes:
+    """按文本模式写出文件内容（换行符与 open(..., 'w') 一致）"""
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode('utf-8')
+
+def transform_text(text: str, key: bytes, link_cache=None) -> str:
+    """转换一篇markdown文本（含 frontmatter），返回链接加密后的文本，不读写文件"""
+    post = frontmatter.loads(text)
+    post.content = process_markdown_content(post.content, key, link_cache)
+    return frontmatter.dumps(post)
+
+def relative_to_root(path, root: Path) -> Path:
+    """把绝对路径或相对于当前目录的路径转换为相对于项目根目录的路径，不在项目内时原样返回"""
+    path = Path(path)
+    try:
+        return (Path.cwd() / path).resolve().relative_to(root.resolve())
+    except ValueError:
+        return path
+
+def transform_documents(documents, key=None, link_cache=None, root=None):
+    """逐个转换 (路径, 文本) 并按输入顺序惰性产出结果，密钥只派生一次
+    
+    结果为 {'path', 'text', 'changed', 'error'}；路径只用于白名单判断（先转换为相对于 root 的路径，
+    默认为当前目录），白名单中的文档原样返回。转换失败时 text 为原文，error 为错误信息，不中断后续文档。
+    """
+    if key is None:
+        key = generate_key(read_password())
+    root = Path(root) if root is not None else Path.cwd()
+    for path, text in documents:
+        if path and is_whitelisted(relative_to_root(path, root)):
+            yield {'path': path, 'text': text, 'changed': False, 'error': None}
+            continue
+        try:
+            output = transform_text(text, key, link_cache)
+        except Exception as e:
+            yield {'path': path, 'text': text, 'changed': False, 'error': f'{type(e).__name__}: {e}'}
+            continue
+        yield {'path': path, 'text': output, 'changed': output != text, 'error': None}
+
+def transform_file(markdown_file: Path, key: bytes, old_entry=None, link_cache=None) -> dict:
+    """处理单个markdown文件并写回，返回处理状态、处理后内容的哈希和新加密的链接"""
+    # 新加密的链接写入 ChainMap 的第一层，由主进程合并进持久缓存
+    new_links = {}
+    if link_cache is not None:
+        link_cache = ChainMap(new_links, link_cache)
     
-    # 匹配包含链接和可能的提取码的完整文本块
-    url_block_pattern = r'[^\n.]*(https?://[^\s]+|magnet:\?[^\s]+)[^\n]*(?:提取码[：:]\s*[A-Za-z0-9]{4,6})?'
-    processed_content = re.sub(url_block_pattern, process_url_with_code, processed_content)
+    # 读取文件，内容哈希未变化则跳过
+    raw = markdown_file.read_bytes()
+    digest = file_hash(raw)
+    if is_up_to_date(old_entry, digest):
+        # 元数据缓存在清单中；旧清单没有时只解析 frontmatter，不重新加密
+        meta = old_entry.get('meta') or post_metadata(frontmatter.loads(decode_text(raw)))
+        return {
+            'status': 'skipped', 'hash': digest, 'links': {}, 'meta': meta,
+            'bytes_in': len(raw), 'bytes_out': len(raw),
+        }
     
-    return processed_content
+    # 处理内容
+    post = frontmatter.loads(decode_text(raw))
+    post.content = process_markdown_content(post.content, key, link_cache)
+    output = encode_text(frontmatter.dumps(post))
+    
+    result = {
+        'links': new_links, 'meta': post_metadata(post),
+        'bytes_in': len(raw), 'bytes_out': len(output),
+    }
+    
+    # 输出与原文件完全一致时不写回，保留文件的 mtime
+    if output == raw:
+        result.update(status='unchanged', hash=digest, encrypted=0)
+        return result
+    markdown_file.write_bytes(output)
+    result.update(
+        status='processed',
+        hash=file_hash(output),
+        encrypted=count_encrypted_links(output) - count_encrypted_links(raw),
+    )
+    return result
+
+def count_encrypted_links(data: bytes) -> int:
+    """统计内容中已加密链接的数量"""
+    return data.count('](encrypted:'.encode())
+
+def _run_task(task, key: bytes, link_cache=None) -> dict:
+    """执行单个文件任务，异常转换为错误结果，由主进程统一报告"""
+    path, old_entry = task
+    start = time.perf_counter()
+    try:
+        result = transform_file(Path(path), key, old_entry, link_cache)
+    except Exception as e:
+        result = {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+    result['seconds'] = time.perf_counter() - start
+    return result
 
-def process_source_markdown():
-    """处理源目录中的markdown文件进行加密"""
-    PASSWORD = "suxingchahui"  # 加密密码
-    key = generate_key(PASSWORD)
+# 工作进程中共享的密钥和链接缓存，由 _init_worker 在进程启动时设置一次
+_worker_key = None
+_worker_link_cache = None
+
+def _init_worker(key: bytes, link_cache=None):
+    """进程池初始化：保存主进程派生好的密钥和链接缓存快照"""
+    global _worker_key, _worker_link_cache
+    _worker_key = key
+    _worker_link_cache = link_cache
+
+def _run_worker_task(task) -> dict:
+    return _run_task(task, _worker_key, _worker_link_cache)
+
+def collect_markdown_files(root: Path, paths=None) -> list:
+    """收集需要处理的markdown文件，paths 为空时遍历整个文章目录"""
+    src_dir = (root / SRC_POSTS_DIR).resolve()
+    if not paths:
+        return sorted(src_dir.rglob('*.md'))
     
-    src_dir = Path('src/posts')
+    files = set()
+    for path in paths:
+        path = Path(path).resolve()
+        if path != src_dir and src_dir not in path.parents:
+            raise ValueError(f'Path is not under {src_dir}: {path}')
+        if path.is_dir():
+            files.update(path.rglob('*.md'))
+        elif path.suffix == '.md' and path.is_file():
+            files.add(path)
+        else:
+            raise ValueError(f'Not a markdown file or directory: {path}')
+    return sorted(files)
+
+def process_source_markdown(root: Path = Path('.'), paths=None, jobs: int = 1, report=None, key=None):
+    """处理源目录中的markdown文件进行加密，key 为空时由 read_password() 派生（长时间运行的调用方可以缓存密钥）"""
+    root = Path(root).resolve()
+    if key is None:
+        with timed_stage(report, 'key_derivation'):
+            key = generate_key(read_password())
+    stage_start = time.perf_counter()
+    link_cache_file = root / LINK_CACHE_FILE
+    link_cache = load_link_cache(key, link_cache_file)
+    cached_links = len(link_cache)
     
-    # 处理所有markdown文件
-    for markdown_file in src_dir.rglob('*.md'):
-        print(f'Processing markdown {markdown_file.relative_to(src_dir)}')
-        
-        # 检查文件是否在白名单中
-        if is_whitelisted(markdown_file):
-            print(f'Skipping whitelisted file: {markdown_file.relative_to(src_dir)}')
+    src_dir = root / SRC_POSTS_DIR
+    manifest_file = root / MANIFEST_FILE
+    manifest = load_manifest(manifest_file)
+    old_entries = manifest['files']
+    # 只处理指定文件时保留其它文件的记录
+    new_entries = dict(old_entries) if paths else {}
+    stats = {'processed': 0, 'skipped': 0, 'unchanged': 0, 'failed': 0, 'links': 0}
+    
+    # 检查文件是否在白名单中，其余文件交给 worker 处理
+    files = []
+    for markdown_file in collect_markdown_files(root, paths):
+        rel_name = markdown_file.relative_to(src_dir).as_posix()
+        whitelisted = is_whitelisted(markdown_file.relative_to(root))
+        files.append((markdown_file, rel_name, whitelisted))
+    tasks = [
+        (str(markdown_file), old_entries.get(rel_name))
+        for markdown_file, rel_name, whitelisted in files
+        if not whitelisted
+    ]
+    
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(tasks)))
+    executor = None
+    if jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(key, link_cache))
+        results = executor.map(_run_worker_task, tasks, chunksize=max(1, len(tasks) // (jobs * 4)))
+    else:
+        results = map(partial(_run_task, key=key, link_cache=link_cache), tasks)
+    
+    # 按文件顺序汇总结果，保证日志和错误输出的顺序稳定
+    try:
+        for markdown_file, rel_name, whitelisted in files:
+            log_detail(f'Processing markdown {rel_name}')
+            if whitelisted:
+                log_detail(f'Skipping whitelisted file: {rel_name}')
+                stats['skipped'] += 1
+                new_entries.pop(rel_name, None)
+                continue
+            
+            result = next(results)
+            if report is not None:
+                report['files'].append({
+                    'path': rel_name,
+                    'status': result['status'],
+                    'seconds': round(result['seconds'], 4),
+                    'bytes_in': result.get('bytes_in', 0),
+                    'bytes_out': result.get('bytes_out', 0),
+                    'links': result.get('encrypted', 0),
+                })
+            if result['status'] == 'error':
+                print(f"Error processing {rel_name}: {result['error']}")
+                stats['failed'] += 1
+                new_entries.pop(rel_name, None)
+                continue
+            stats[result['status']] += 1
+            stats['links'] += result.get('encrypted', 0)
+            # 多个进程同时加密同一个新链接时，按文件顺序保留第一个密文
+            for url, encrypted in result['links'].items():
+                link_cache.setdefault(url, encrypted)
+            new_entries[rel_name] = {'hash': result['hash'], 'version': PROCESS_VERSION, 'meta': result['meta']}
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    manifest['files'] = new_entries
+    save_manifest(manifest, manifest_file)
+    if len(link_cache) != cached_links:
+        save_link_cache(link_cache, key, link_cache_file)
+    print(
+        f"Markdown summary: {stats['processed']} processed, "
+        f"{stats['skipped']} skipped, {stats['unchanged']} unchanged, "
+        f"{stats['failed']} failed, {stats['links']} links encrypted"
+    )
+    if report is not None:
+        report['stages']['markdown'] = round(time.perf_counter() - stage_start, 4)
+        report['markdown'] = stats
+    return stats
+
+def write_gzip_json(data, path: Path) -> bool:
+    """写出 gzip 压缩的紧凑 JSON，内容不变时不写入（gzip 头不含时间戳，输出是确定的），返回是否写入"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    blob = gzip.compress(payload.encode('utf-8'), compresslevel=9, mtime=0)
+    try:
+        if path.read_bytes() == blob:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(path.name + '.tmp')
+    tmp_file.write_bytes(blob)
+    os.replace(tmp_file, path)
+    return True
+
+def build_post_index(root: Path = Path('.'), by_year: bool = False, report=None) -> dict:
+    """根据构建清单中缓存的元数据生成文章索引，按日期从新到旧排序
+    
+    输出 public/post-index/index.json.gz；by_year 时额外按年份输出分片和年份列表。
+    白名单中的页面（关于、公告等）不在清单中，也不会出现在索引里。
+    """
+    root = Path(root).resolve()
+    stage_start = time.perf_counter()
+    src_dir = root / SRC_POSTS_DIR
+    index_dir = root / POST_INDEX_DIR
+    manifest = load_manifest(root / MANIFEST_FILE)
+    
+    posts = []
+    for rel_name, entry in manifest['files'].items():
+        meta = entry.get('meta')
+        # 只处理部分文件时清单中可能残留已删除文章的记录
+        if meta is None or not (src_dir / rel_name).is_file():
             continue
-        
-        # 读取文件
-        post = frontmatter.load(markdown_file)
-        
-        # 处理内容
-        post.content = process_markdown_content(post.content, key)
-        
-        # 写回文件
-        with open(markdown_file, 'w', encoding='utf-8') as f:
-            f.write(frontmatter.dumps(post))
+        post = dict(meta, slug=meta.get('slug') or post_slug(rel_name))
+        posts.append(post)
+    posts.sort(key=lambda post: (post['date'], post['slug']), reverse=True)
+    
+    written = 0
+    written += write_gzip_json({'version': POST_INDEX_VERSION, 'posts': posts}, index_dir / POST_INDEX_FILE)
+    shard_files = set()
+    if by_year:
+        years = {}
+        for post in posts:
+            years.setdefault(post['date'][:4] or 'undated', []).append(post)
+        for year, year_posts in years.items():
+            shard_files.add(f'{year}.json.gz')
+            written += write_gzip_json(
+                {'version': POST_INDEX_VERSION, 'year': year, 'posts': year_posts},
+                index_dir / f'{year}.json.gz',
+            )
+        shard_files.add(POST_INDEX_YEARS_FILE)
+        written += write_gzip_json(
+            {'version': POST_INDEX_VERSION, 'years': {year: len(year_posts) for year, year_posts in years.items()}},
+            index_dir / POST_INDEX_YEARS_FILE,
+        )
+    # 删除不再需要的年份分片（文章删除或关闭分片后）
+    removed = 0
+    if index_dir.is_dir():
+        for path in index_dir.glob('*.json.gz'):
+            if path.name != POST_INDEX_FILE and path.name not in shard_files:
+                path.unlink()
+                removed += 1
+    
+    stats = {
+        'posts': len(posts),
+        'bytes': (index_dir / POST_INDEX_FILE).stat().st_size,
+        'written': written,
+        'removed': removed,
+    }
+    print(f"Post index: {stats['posts']} posts, {stats['bytes']} bytes compressed, {written} file(s) written")
+    if report is not None:
+        report['stages']['post_index'] = round(time.perf_counter() - stage_start, 4)
+        report['post_index'] = stats
+    return stats
 
-def copy_images():
-    """复制图片到public目录，只清理 posts 相关目录"""
-    src_dir = Path('src/posts')
-    public_posts_dir = Path('public/src/posts')
+def build_search_index(root: Path = Path('.'), report=None) -> dict:
+    """根据构建清单生成全文搜索的倒排索引
     
-    # 只清理 posts 相关目录
-    if public_posts_dir.exists():
-        print(f'Cleaning directory: {public_posts_dir}')
-        shutil.rmtree(public_posts_dir)
+    只重新分词哈希发生变化的文章，其余使用缓存；没有文章变化且索引文件完整时不重写。
+    输出 docs.json.gz（文章列表和分片列表）和 terms/<分片>.json.gz（{词项: [[文章序号, 次数], ...]}）。
+    """
+    root = Path(root).resolve()
+    stage_start = time.perf_counter()
+    src_dir = root / SRC_POSTS_DIR
+    index_dir = root / SEARCH_INDEX_DIR
+    cache_file = root / SEARCH_TERMS_CACHE
+    manifest = load_manifest(root / MANIFEST_FILE)
+    cache = load_manifest(cache_file)
+    if cache.get('version') != SEARCH_INDEX_VERSION:
+        cache = {'files': {}}
+    old_files = cache['files']
     
-    # 确保目标目录存在
-    public_posts_dir.mkdir(parents=True, exist_ok=True)
+    # 与文章索引相同：白名单页面和处理失败的文件不在清单中
+    new_files = {}
+    tokenized = 0
+    for rel_name, entry in sorted(manifest['files'].items()):
+        if entry.get('meta') is None or not (src_dir / rel_name).is_file():
+            continue
+        cached = old_files.get(rel_name)
+        if cached is not None and cached['hash'] == entry['hash']:
+            new_files[rel_name] = cached
+            continue
+        post = frontmatter.loads(decode_text((src_dir / rel_name).read_bytes()))
+        terms = search_terms(f"{entry['meta']['title']}\n{post.content}")
+        new_files[rel_name] = {
+            'hash': entry['hash'],
+            'title': entry['meta']['title'],
+            'slug': entry['meta'].get('slug') or post_slug(rel_name),
+            'length': sum(terms.values()),
+            'terms': terms,
+        }
+        tokenized += 1
+    
+    changed = tokenized > 0 or new_files.keys() != old_files.keys()
+    docs_path = index_dir / SEARCH_DOCS_FILE
+    written = 0
+    if changed or not docs_path.exists():
+        shards = {}
+        docs = []
+        for doc_id, (rel_name, doc) in enumerate(sorted(new_files.items())):
+            docs.append([doc['slug'], doc['title'], doc['length']])
+            for term, count in doc['terms'].items():
+                shards.setdefault(search_shard(term), {}).setdefault(term, []).append([doc_id, count])
+        terms_dir = index_dir / 'terms'
+        for shard, postings in shards.items():
+            written += write_gzip_json(postings, terms_dir / f'{shard}.json.gz')
+        if terms_dir.is_dir():
+            for path in terms_dir.glob('*.json.gz'):
+                if path.name[:-len('.json.gz')] not in shards:
+                    path.unlink()
+        written += write_gzip_json({
+            'version': SEARCH_INDEX_VERSION,
+            'shardBits': SEARCH_SHARD_BITS,
+            'docs': docs,
+            'shards': sorted(shards),
+        }, docs_path)
+        cache = {'version': SEARCH_INDEX_VERSION, 'files': new_files}
+        save_manifest(cache, cache_file)
     
-    # 遍历源目录中的图片文件
-    image_extensions = {'.webp', '.jpg', '.jpeg', '.png', '.gif', '.svg'}
+    stats = {'documents': len(new_files), 'tokenized': tokenized, 'written': written}
+    print(f"Search index: {stats['documents']} documents, {tokenized} tokenized, {written} file(s) written")
+    if report is not None:
+        report['stages']['search_index'] = round(time.perf_counter() - stage_start, 4)
+        report['search_index'] = stats
+    return stats
+
+# 需要复制到 public 目录的图片类型
+IMAGE_SUFFIXES = {'.webp', '.jpg', '.jpeg', '.png', '.gif', '.svg'}
+# 图片同步方式：复制 / 硬链接 / reflink（写时复制克隆），后两者失败时退回复制
+LINK_MODES = ('copy', 'hardlink', 'reflink')
+# Linux FICLONE ioctl 编号
+FICLONE = 0x40049409
+
+# 构建时图片优化参数（与前端 imageUtils.ts 的上传压缩参数一致）
+WEBP_MAX_WIDTH = 1920
+WEBP_QUALITY = 80
+RESPONSIVE_WIDTHS = (480, 960)
+# 可以转换为 WebP 的图片类型（gif 可能是动图，svg 是矢量图，都保留原图）
+OPTIMIZABLE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+# 图片内容哈希缓存与转换结果缓存
+IMAGE_HASH_INDEX = BUILD_CACHE_DIR / 'image_hashes.json'
+IMAGE_CACHE_DIR = BUILD_CACHE_DIR / 'images'
+# 图片元数据清单：尺寸、大小、哈希和内联占位图，前端据此预留空间避免布局跳动
+IMAGE_MANIFEST_FILE = Path('public/image-manifest.json')
+# 按内容哈希缓存的尺寸和占位图，同一张图片只解码一次
+IMAGE_META_CACHE = BUILD_CACHE_DIR / 'image_meta.json'
+# 占位图的最长边（像素）和 WebP 质量
+LQIP_SIZE = 16
+LQIP_QUALITY = 30
+# 图片去重输出：每个不同内容的图片只保存一份，文件名为内容哈希，可以永久缓存
+IMAGE_ASSETS_DIR = Path('public/assets/images')
+IMAGE_MAP_FILE = Path('public/image-map.json')
+ASSET_HASH_LENGTH = 16
+SVG_SIZE_RE = re.compile(r'<svg\b[^>]*?\bviewBox\s*=\s*["\']\s*[-\d.]+[\s,]+[-\d.]+[\s,]+([\d.]+)[\s,]+([\d.]+)', re.IGNORECASE)
+
+def collect_images(src_dir: Path) -> dict:
+    """收集源目录中的图片，返回 {相对路径: 源文件}"""
+    images = {}
     for src_path in src_dir.rglob('*'):
-        if not src_path.is_file() or src_path.suffix.lower() not in image_extensions:
+        if src_path.suffix.lower() in IMAGE_SUFFIXES and src_path.is_file():
+            images[src_path.relative_to(src_dir).as_posix()] = src_path
+    return images
+
+def _reflink(src_path: Path, dst_path: Path):
+    """用 FICLONE 克隆文件（btrfs/xfs 等支持写时复制的文件系统）"""
+    if fcntl is None:
+        raise OSError('reflink is not supported on this platform')
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dst_path)
+
+def _transfer_file(src_path: Path, dst_path: Path, link_mode: str) -> str:
+    """先写临时文件再替换目标，避免写穿已有的硬链接；返回实际使用的方式"""
+    tmp_path = dst_path.with_name(f'.{dst_path.name}.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+    used = 'copy'
+    try:
+        if link_mode == 'hardlink':
+            os.link(src_path, tmp_path)
+            used = 'hardlink'
+        elif link_mode == 'reflink':
+            _reflink(src_path, tmp_path)
+            used = 'reflink'
+    except OSError:
+        # 跨文件系统或不支持时退回普通复制
+        if tmp_path.exists():
+            tmp_path.unlink()
+        used = 'copy'
+    if used == 'copy':
+        shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+    return used
+
+def _is_current(src_path: Path, dst_path: Path, src_stat, verify_hash: bool) -> bool:
+    """根据大小、mtime（以及可选的内容哈希）判断目标文件是否无需更新"""
+    try:
+        dst_stat = dst_path.stat()
+    except FileNotFoundError:
+        return False
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return True  # 已经是同一个文件（硬链接）
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if not verify_hash:
+        return src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+    if file_hash(src_path.read_bytes()) != file_hash(dst_path.read_bytes()):
+        return False
+    if src_stat.st_mtime_ns != dst_stat.st_mtime_ns:
+        shutil.copystat(src_path, dst_path)
+    return True
+
+def sync_files(plan: dict, dst_dir: Path, verify_hash: bool = False, link_mode: str = 'copy',
+               prune: bool = True) -> dict:
+    """把 {相对路径: 源文件} 同步到目标目录：只更新变化的文件，prune 时删除多余的旧文件"""
+    stats = {
+        'copied': 0, 'linked': 0, 'skipped': 0, 'removed': 0,
+        'bytes_copied': 0, 'bytes_skipped': 0,
+    }
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    
+    for rel_name in sorted(plan):
+        src_path = plan[rel_name]
+        dst_path = dst_dir / rel_name
+        src_stat = src_path.stat()
+        if _is_current(src_path, dst_path, src_stat, verify_hash):
+            stats['skipped'] += 1
+            stats['bytes_skipped'] += src_stat.st_size
             continue
-            
-        # 计算目标路径
-        rel_path = src_path.relative_to(src_dir)
-        dst_path = public_posts_dir / rel_path
         
         # 确保目标文件夹存在
         dst_path.parent.mkdir(parents=True, exist_ok=True)
-        print(f'Copying {rel_path} to {dst_path}')
-        shutil.copy2(src_path, dst_path)
+        log_detail(f'Copying {rel_name} to {dst_path}')
+        if _transfer_file(src_path, dst_path, link_mode) == 'copy':
+            stats['copied'] += 1
+            stats['bytes_copied'] += src_stat.st_size
+        else:
+            stats['linked'] += 1
+    
+    if not prune:
+        return stats
+    
+    # 删除源目录中已经不存在的文件和空文件夹
+    for dirpath, dirnames, filenames in os.walk(dst_dir, topdown=False):
+        dirpath = Path(dirpath)
+        for filename in filenames:
+            dst_path = dirpath / filename
+            if dst_path.relative_to(dst_dir).as_posix() not in plan:
+                log_detail(f'Removing stale file {dst_path}')
+                dst_path.unlink()
+                stats['removed'] += 1
+        if dirpath != dst_dir and not any(dirpath.iterdir()):
+            dirpath.rmdir()
+    return stats
+
+def remove_output_dir(dst_dir: Path, stop_dir: Path) -> int:
+    """删除不再使用的输出目录及 stop_dir 以下变空的上级目录，返回删除的文件数"""
+    if not dst_dir.exists():
+        return 0
+    removed = sync_files({}, dst_dir)['removed']
+    directory = dst_dir
+    while directory != stop_dir and directory.is_dir() and not any(directory.iterdir()):
+        directory.rmdir()
+        directory = directory.parent
+    return removed
+
+def cached_file_hashes(files: dict, index_file: Path) -> dict:
+    """计算 {相对路径: 文件} 的内容哈希，大小和 mtime 未变的文件直接使用上次的结果"""
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    
+    digests = {}
+    new_index = {}
+    for rel_name, path in files.items():
+        stat = path.stat()
+        entry = index.get(rel_name)
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+            digest = entry['hash']
+        else:
+            digest = file_hash(path.read_bytes())
+        digests[rel_name] = digest
+        new_index[rel_name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+    
+    if new_index != index:
+        save_manifest(new_index, index_file)
+    return digests
+
+def image_variant_names(rel_name: str, widths) -> dict:
+    """优化后图片的文件名：原名加 .webp 为限宽后的主图，另有 .<宽度>w.webp 响应式版本"""
+    names = {'full': f'{rel_name}.webp'}
+    for width in widths:
+        names[f'{width}w'] = f'{rel_name}.{width}w.webp'
+    return names
+
+def encode_image_variants(src_path: Path, out_dir: Path, max_width: int, widths, quality: int) -> list:
+    """把一张图片转换为限宽 WebP 和若干响应式宽度版本，返回生成的版本名"""
+    with Image.open(src_path) as img:
+        if getattr(img, 'n_frames', 1) > 1:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            return []  # 动图保留原图
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        
+        tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        variants = []
+        targets = [('full', min(img.width, max_width))]
+        # 只生成比原图窄的响应式版本，不放大图片
+        targets += [(f'{width}w', width) for width in widths if width < min(img.width, max_width)]
+        for variant, width in targets:
+            height = max(1, round(img.height * width / img.width))
+            resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+            resized.save(tmp_dir / f'{variant}.webp', 'WEBP', quality=quality, method=4)
+            variants.append(variant)
+    
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return variants
 
-def main():
+def _run_encode_task(task) -> dict:
+    """进程池任务：转换单张图片，异常转换为错误结果"""
+    src_path, out_dir = task
+    try:
+        variants = encode_image_variants(Path(src_path), Path(out_dir), WEBP_MAX_WIDTH, RESPONSIVE_WIDTHS, WEBP_QUALITY)
+        return {'variants': variants}
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+def cached_variants(out_dir: Path):
+    """读取缓存的转换结果，清单缺失或版本文件不完整时返回 None"""
+    try:
+        with open(out_dir / 'variants.json', 'r', encoding='utf-8') as f:
+            variants = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not all((out_dir / f'{variant}.webp').is_file() for variant in variants):
+        return None
+    return variants
+
+def optimize_images(root: Path, images: dict, jobs: int = 1, digests=None) -> dict:
+    """生成 WebP 优化版本，返回 {输出相对路径: 缓存文件} 供同步到 public 目录
+
+    转换结果按 源图片哈希 + 转换参数 缓存在 .build_cache/images，同一张图片只转换一次。
+    """
+    if Image is None:
+        print('Pillow is not installed, skipping image optimization')
+        return {}
+    
+    candidates = {
+        rel_name: path for rel_name, path in images.items()
+        if path.suffix.lower() in OPTIMIZABLE_SUFFIXES
+    }
+    if digests is None:
+        digests = cached_file_hashes(candidates, root / IMAGE_HASH_INDEX)
+    params = f'{WEBP_MAX_WIDTH}-{WEBP_QUALITY}-' + '-'.join(str(w) for w in RESPONSIVE_WIDTHS)
+    cache_dir = root / IMAGE_CACHE_DIR
+    
+    entries = {}
+    variants_by_dir = {}
+    tasks = []
+    for rel_name in sorted(candidates):
+        cache_key = hashlib.sha256(f'{digests[rel_name]}:{params}'.encode()).hexdigest()
+        out_dir = cache_dir / cache_key[:2] / cache_key
+        entries[rel_name] = out_dir
+        # 内容相同的图片（如多篇文章共用的头图）共用一个缓存目录，只转换一次，
+        # 否则多个进程会同时写入同一个目录
+        if out_dir in variants_by_dir:
+            continue
+        variants_by_dir[out_dir] = cached_variants(out_dir)
+        if variants_by_dir[out_dir] is None:
+            tasks.append((str(candidates[rel_name]), str(out_dir)))
+    
+    # 只转换缓存中没有的图片
+    encoded = 0
+    if tasks:
+        print(f'Encoding {len(tasks)} image(s) to WebP...')
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(_run_encode_task, tasks))
+        else:
+            results = [_run_encode_task(task) for task in tasks]
+        for (src_path, out_dir), result in zip(tasks, results):
+            if 'error' in result:
+                print(f"Error optimizing {src_path}: {result['error']}")
+                continue
+            out_dir = Path(out_dir)
+            missing = [v for v in result['variants'] if not (out_dir / f'{v}.webp').is_file()]
+            if missing:
+                print(f"Error optimizing {src_path}: missing output {', '.join(missing)}")
+                continue
+            # 版本文件都已生成后才写入清单，清单存在即表示缓存完整
+            with open(out_dir / 'variants.json', 'w', encoding='utf-8') as f:
+                json.dump(result['variants'], f)
+            variants_by_dir[out_dir] = result['variants']
+            encoded += 1
+    
+    plan = {}
+    for rel_name, out_dir in entries.items():
+        variants = variants_by_dir[out_dir]
+        if variants is None:
+            continue
+        names = image_variant_names(rel_name, RESPONSIVE_WIDTHS)
+        for variant in variants:
+            plan[names[variant]] = out_dir / f'{variant}.webp'
+    cached = len(variants_by_dir) - len(tasks)
+    print(f'Image optimization: {encoded} encoded, {cached} cached')
+    return plan
+
+def svg_size(path: Path):
+    """从 SVG 的 viewBox 读取尺寸，没有时返回 None"""
+    match = SVG_SIZE_RE.search(path.read_bytes()[:4096].decode('utf-8', 'replace'))
+    if match is None:
+        return None
+    return round(float(match.group(1))), round(float(match.group(2)))
+
+def read_image_meta(path: Path) -> dict:
+    """读取图片显示时的尺寸（已按 EXIF 方向旋转）并生成 WebP 内联占位图"""
+    if path.suffix.lower() == '.svg':
+        size = svg_size(path)
+        return {'width': size[0], 'height': size[1]} if size else {}
+    with Image.open(path) as img:
+        width, height = img.size
+        # JPEG 可以直接按缩小的比例解码，生成占位图时不需要完整解码大图
+        img.draft('RGB', (LQIP_SIZE * 8, LQIP_SIZE * 8))
+        orientation = img.getexif().get(0x0112, 1)
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+        thumb = ImageOps.exif_transpose(img)
+        thumb = thumb.convert('RGBA' if 'A' in thumb.getbands() or 'transparency' in thumb.info else 'RGB')
+        thumb.thumbnail((LQIP_SIZE, LQIP_SIZE))
+        buffer = io.BytesIO()
+        thumb.save(buffer, 'WEBP', quality=LQIP_QUALITY)
+    return {
+        'width': width,
+        'height': height,
+        'lqip': 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+def _run_meta_task(path: str) -> dict:
+    """进程池任务：读取单张图片的元数据，异常转换为错误结果"""
+    try:
+        return read_image_meta(Path(path))
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+def write_json_if_changed(data, path: Path) -> bool:
+    """写出紧凑 JSON，内容不变时不写入（保留 mtime），返回是否写入"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    try:
+        if path.read_text(encoding='utf-8') == payload:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_suffix('.tmp')
+    tmp_file.write_text(payload, encoding='utf-8')
+    os.replace(tmp_file, path)
+    return True
+
+def image_url(rel_name: str) -> str:
+    """src/posts 中图片在站点上的地址"""
+    return '/' + (PUBLIC_POSTS_DIR / rel_name).relative_to('public').as_posix()
+
+def dedupe_plan(plan: dict, images: dict, digests: dict):
+    """把按路径的输出计划改为按内容哈希命名，返回 ({资源文件名: 源文件}, {原地址: 资源地址})
+    
+    优化生成的 WebP 版本沿用原图的后缀规则，例如 <哈希>.png.480w.webp。
+    """
+    sources = {}
+    for rel_name in images:
+        sources[rel_name] = (rel_name, '')
+        for name in image_variant_names(rel_name, RESPONSIVE_WIDTHS).values():
+            sources[name] = (rel_name, name[len(rel_name):])
+    asset_prefix = '/' + IMAGE_ASSETS_DIR.relative_to('public').as_posix()
+    assets = {}
+    mapping = {}
+    for out_name, src_path in sorted(plan.items()):
+        rel_name, extra = sources[out_name]
+        asset = f'{digests[rel_name][:ASSET_HASH_LENGTH]}{Path(rel_name).suffix.lower()}{extra}'
+        assets.setdefault(asset, src_path)
+        mapping[image_url(out_name)] = f'{asset_prefix}/{asset}'
+    return assets, mapping
+
+def write_image_manifest(root: Path, images: dict, digests: dict, jobs: int = 1, mapping=None) -> dict:
+    """生成 public/image-manifest.json：{图片URL: {width, height, bytes, hash, lqip[, asset]}}
+    
+    尺寸和占位图按内容哈希缓存，只解码新增或变化的图片；未安装 Pillow 时只记录大小和哈希。
+    mapping 为去重模式下的 {原地址: 资源地址}。
+    """
+    cache_file = root / IMAGE_META_CACHE
+    cache = load_manifest(cache_file)['files']
+    pending = sorted({
+        digests[rel_name]: str(path) for rel_name, path in images.items()
+        if digests[rel_name] not in cache
+        and (Image is not None or path.suffix.lower() == '.svg')
+    }.items())
+    
+    if pending:
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(pending)))
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(_run_meta_task, [path for _, path in pending]))
+        else:
+            results = [_run_meta_task(path) for _, path in pending]
+        for (digest, path), result in zip(pending, results):
+            if 'error' in result:
+                print(f"Error reading image {path}: {result['error']}")
+                continue
+            cache[digest] = result
+    
+    entries = {}
+    for rel_name, path in sorted(images.items()):
+        digest = digests[rel_name]
+        entry = {'bytes': path.stat().st_size, 'hash': digest}
+        entry.update(cache.get(digest, {}))
+        if mapping:
+            entry['asset'] = mapping[image_url(rel_name)]
+        entries[image_url(rel_name)] = entry
+    
+    # 只保留仍在使用的图片的缓存
+    used = {digests[rel_name] for rel_name in images}
+    cache = {digest: meta for digest, meta in cache.items() if digest in used}
+    save_manifest({'files': cache}, cache_file)
+    
+    write_json_if_changed(entries, root / IMAGE_MANIFEST_FILE)
+    print(f'Image manifest: {len(entries)} images, {len(pending)} decoded')
+    return {'images': len(entries), 'decoded': len(pending)}
+
+def copy_images(root: Path = Path('.'), verify_hash: bool = False, link_mode: str = 'copy',
+                optimize: bool = False, jobs: int = 1, report=None, dedupe: bool = False):
+    """同步图片到public目录，只更新新增或变化的图片并清理 posts 目录中多余的文件，然后写出图片元数据清单
+    
+    dedupe 时不再按文章路径复制，而是按内容哈希写入 public/assets/images，并输出地址映射。
+    """
+    stage_start = time.perf_counter()
+    src_dir = root / SRC_POSTS_DIR
+    public_posts_dir = root / PUBLIC_POSTS_DIR
+    assets_dir = root / IMAGE_ASSETS_DIR
+    map_file = root / IMAGE_MAP_FILE
+    
+    images = collect_images(src_dir)
+    # 图片优化和元数据清单共用同一份哈希缓存
+    digests = cached_file_hashes(images, root / IMAGE_HASH_INDEX)
+    plan = dict(images)
+    if optimize:
+        plan.update(optimize_images(root, images, jobs, digests))
+    mapping = None
+    if dedupe:
+        assets, mapping = dedupe_plan(plan, images, digests)
+        stats = sync_files(assets, assets_dir, verify_hash, link_mode)
+        # 按路径复制的旧输出不再需要
+        stats['removed'] += remove_output_dir(public_posts_dir, root / 'public')
+        write_json_if_changed(mapping, map_file)
+        stats['assets'] = len(assets)
+        stats['bytes_deduplicated'] = (
+            sum(path.stat().st_size for path in plan.values())
+            - sum(path.stat().st_size for path in assets.values())
+        )
+        print(f"Image dedupe: {len(plan)} file(s) stored as {len(assets)} unique asset(s), "
+              f"{stats['bytes_deduplicated']} bytes saved")
+    else:
+        stats = sync_files(plan, public_posts_dir, verify_hash, link_mode)
+        # 关闭去重后清理之前的去重输出
+        stats['removed'] += remove_output_dir(assets_dir, root / 'public')
+        if map_file.exists():
+            map_file.unlink()
+    stats['manifest'] = write_image_manifest(root, images, digests, jobs, mapping)
+    print(
+        f"Image summary: {stats['copied']} copied ({stats['bytes_copied']} bytes), "
+        f"{stats['linked']} linked, {stats['skipped']} skipped ({stats['bytes_skipped']} bytes), "
+        f"{stats['removed']} removed"
+    )
+    if report is not None:
+        report['stages']['images'] = round(time.perf_counter() - stage_start, 4)
+        report['images'] = stats
+    return stats
+
+def snapshot_tree(src_dir: Path) -> dict:
+    """记录目录下所有文件的 (mtime, 大小)，用于轮询比较"""
+    snapshot = {}
+    for dirpath, _, filenames in os.walk(src_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def _poll_tree(src_dir: Path, events, stop_event):
+    """轮询线程：把新增、修改和删除的文件放入事件队列"""
+    snapshot = snapshot_tree(src_dir)
+    while not stop_event.wait(WATCH_POLL_INTERVAL):
+        current = snapshot_tree(src_dir)
+        for path in current.keys() | snapshot.keys():
+            if current.get(path) != snapshot.get(path):
+                events.put(path)
+        snapshot = current
+
+def watch_batches(src_dir: Path, debounce: float = WATCH_DEBOUNCE):
+    """监视目录，每当修改停止 debounce 秒后产出这段时间内变化的路径集合
+    
+    优先使用 watchdog（Linux 上为 inotify），未安装时轮询；处理期间发生的修改进入下一批。
+    """
+    events = queue.Queue()
+    if Observer is not None:
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # 文件夹的 modified 事件在其中任何文件变化时都会出现，只关心文件夹的增删和移动
+                if event.event_type not in ('created', 'modified', 'deleted', 'moved'):
+                    return
+                if event.is_directory and event.event_type == 'modified':
+                    return
+                events.put(event.src_path)
+                if getattr(event, 'dest_path', None):
+                    events.put(event.dest_path)
+        
+        observer = Observer()
+        observer.schedule(Handler(), str(src_dir), recursive=True)
+        observer.start()
+        stop = observer.stop
+    else:
+        print(f'watchdog is not installed, polling every {WATCH_POLL_INTERVAL}s')
+        stop_event = threading.Event()
+        threading.Thread(target=_poll_tree, args=(src_dir, events, stop_event), daemon=True).start()
+        stop = stop_event.set
+    
+    try:
+        while True:
+            paths = {events.get()}
+            while True:
+                try:
+                    paths.add(events.get(timeout=debounce))
+                except queue.Empty:
+                    break
+            yield {Path(path) for path in paths}
+    finally:
+        stop()
+
+def rebuild_touched(root: Path, paths, key: bytes, args) -> dict:
+    """只重新处理变化的markdown文件和图片，然后更新索引和图片清单"""
+    src_dir = root / SRC_POSTS_DIR
+    public_posts_dir = root / PUBLIC_POSTS_DIR
+    manifest = load_manifest(root / MANIFEST_FILE)['files']
+    markdown = []
+    markdown_removed = False
+    touched_images = set()
+    full_image_sync = False
+    for path in sorted(paths):
+        try:
+            rel_name = path.relative_to(src_dir).as_posix()
+        except ValueError:
+            continue
+        if path.suffix == '.md':
+            if not path.is_file():
+                markdown_removed = True
+            elif is_whitelisted(path.relative_to(root)):
+                continue
+            # 自己写回的文件也会触发事件，内容与清单一致的直接忽略
+            elif not is_up_to_date(manifest.get(rel_name), file_hash(path.read_bytes())):
+                markdown.append(path)
+        elif path.suffix.lower() in IMAGE_SUFFIXES:
+            touched_images.add(rel_name)
+        elif path.is_dir():
+            markdown.append(path)
+            full_image_sync = True
+        elif (public_posts_dir / rel_name).is_dir():
+            # 整个文件夹被删除或移走，逐个文件的事件不一定会报告
+            markdown_removed = full_image_sync = True
+    
+    result = {'markdown': len(markdown), 'images': len(touched_images)}
+    if markdown:
+        stats = process_source_markdown(root, markdown, 1, key=key)
+        result['failed'] = stats['failed']
+    if markdown or markdown_removed:
+        build_post_index(root, args.index_by_year)
+        build_search_index(root)
+    
+    # 去重输出的文件名和映射依赖全部图片，直接重新同步（未变化的图片只比较大小和 mtime）
+    if full_image_sync or (touched_images and args.dedupe_images):
+        copy_images(root, args.hash_images, args.link_mode, args.optimize_images, args.jobs,
+                    dedupe=args.dedupe_images)
+    elif touched_images:
+        # 图片清单需要全部图片的哈希，未变化的图片只比较大小和 mtime，不读取内容
+        images = collect_images(src_dir)
+        digests = cached_file_hashes(images, root / IMAGE_HASH_INDEX)
+        changed = {rel_name: images[rel_name] for rel_name in touched_images if rel_name in images}
+        plan = dict(changed)
+        if args.optimize_images:
+            plan.update(optimize_images(root, changed, args.jobs, digests))
+        stats = sync_files(plan, public_posts_dir, args.hash_images, args.link_mode, prune=False)
+        removed = 0
+        for rel_name in touched_images - images.keys():
+            for name in [rel_name, *image_variant_names(rel_name, RESPONSIVE_WIDTHS).values()]:
+                if (public_posts_dir / name).exists():
+                    (public_posts_dir / name).unlink()
+                    removed += 1
+            # 清理删除后变空的文件夹
+            parent = (public_posts_dir / rel_name).parent
+            while parent != public_posts_dir and parent.is_dir() and not any(parent.iterdir()):
+                parent.rmdir()
+                parent = parent.parent
+        write_image_manifest(root, images, digests, args.jobs)
+        print(f"Image summary: {stats['copied'] + stats['linked']} updated, {removed} removed")
+    return result
+
+def watch(root: Path, key: bytes, args):
+    """常驻监视 src/posts，密钥只派生一次，每批修改只处理涉及的文件"""
+    src_dir = root / SRC_POSTS_DIR
+    print(f'\nWatching {src_dir} for changes (Ctrl+C to stop)...')
+    try:
+        for paths in watch_batches(src_dir):
+            start = time.perf_counter()
+            print(f'\n{len(paths)} change(s) detected')
+            try:
+                rebuild_touched(root, paths, key, args)
+            except Exception as e:
+                # 保存到一半的文件等错误不应该结束监视
+                print(f'Error during rebuild: {type(e).__name__}: {e}')
+                continue
+            print(f'Rebuilt in {time.perf_counter() - start:.3f}s')
+    except KeyboardInterrupt:
+        print('\nStopped watching')
+
+def iter_nul_records(stream, chunk_size: int = 65536):
+    """从二进制流中逐条读取 路径\\0文本\\0 记录，读到一条就产出一条"""
+    fields = []
+    pending = []
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        *complete, rest = chunk.split(b'\0')
+        for piece in complete:
+            pending.append(piece)
+            fields.append(b''.join(pending))
+            pending = []
+            if len(fields) == 2:
+                yield fields[0].decode('utf-8'), decode_text(fields[1])
+                fields = []
+        pending.append(rest)
+    if fields or any(pending):
+        raise ValueError('Truncated NUL-delimited input: expected path\\0text\\0 records')
+
+def iter_filter_documents(args):
+    """过滤模式的输入：标准输入（单篇或 -z 批量）或命令行指定的文件"""
+    if args.stdin and args.null:
+        yield from iter_nul_records(sys.stdin.buffer)
+    elif args.stdin:
+        yield args.stdin_path, decode_text(sys.stdin.buffer.read())
+    else:
+        for path in args.paths:
+            yield path, decode_text(Path(path).read_bytes())
+
+def run_filter(args, root: Path) -> int:
+    """--stdin / --stdout 过滤模式：只转换文本并写到标准输出，不修改文件、不更新清单
+    
+    标准输出只包含转换结果，提示和错误信息写到标准错误。
+    """
+    if not args.stdin and not args.paths:
+        print('Error: --stdout needs markdown file paths', file=sys.stderr)
+        return 2
+    if not args.null and not args.stdin and len(args.paths) > 1:
+        print('Error: use -z to write several files to stdout', file=sys.stderr)
+        return 2
+    try:
+        key = generate_key(read_password(args.password_file))
+    except (OSError, ValueError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 2
+    
+    link_cache_file = root / LINK_CACHE_FILE
+    link_cache = load_link_cache(key, link_cache_file)
+    cached_links = len(link_cache)
+    out = sys.stdout.buffer
+    failed = 0
+    try:
+        for result in transform_documents(iter_filter_documents(args), key, link_cache, root):
+            if result['error']:
+                # 转换失败时输出原文，管道中的下一步不会拿到空内容
+                print(f"Error processing {result['path'] or '<stdin>'}: {result['error']}", file=sys.stderr)
+                failed += 1
+            if args.null:
+                out.write(result['path'].encode('utf-8') + b'\0' + result['text'].encode('utf-8') + b'\0')
+            else:
+                out.write(result['text'].encode('utf-8'))
+            # 逐条输出，调用方可以边写边读
+            out.flush()
+    except (OSError, ValueError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 2
+    if len(link_cache) != cached_links:
+        save_link_cache(link_cache, key, link_cache_file)
+    return 1 if failed else 0
+
+def finish_report(report: dict, total_seconds: float) -> dict:
+    """补充总耗时和最慢的文件，并打印各阶段耗时"""
+    report['stages']['total'] = round(total_seconds, 4)
+    report['files'].sort(key=lambda entry: entry['path'])
+    report['slowest'] = [
+        entry['path'] for entry in sorted(report['files'], key=lambda entry: -entry['seconds'])
+        if entry['status'] in ('processed', 'unchanged', 'error')
+    ][:SLOWEST_FILES]
+    
+    print("\nStage timings:")
+    for name, seconds in report['stages'].items():
+        print(f"  {name:16} {seconds:8.3f}s")
+    if report['slowest']:
+        timings = {entry['path']: entry for entry in report['files']}
+        print("Slowest files:")
+        for path in report['slowest']:
+            entry = timings[path]
+            print(f"  {entry['seconds']:8.3f}s  {entry['bytes_in']:>9} bytes  {entry['links']:>4} links  {path}")
+    return report
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='博客构建预处理：加密文章链接、生成文章和搜索索引并复制图片')
+    parser.add_argument(
+        'paths', nargs='*',
+        help='只处理指定的markdown文件或目录（默认处理整个 src/posts）',
+    )
+    parser.add_argument('--root', default='.', help='项目根目录（默认为当前目录）')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='并行处理markdown的进程数，0 表示使用全部CPU核心（默认 1）',
+    )
+    parser.add_argument('-q', '--quiet', action='store_true', help='不输出逐文件的进度信息')
+    parser.add_argument('--report', help='把各阶段和逐文件的耗时统计写入 JSON 文件，例如 build-report.json')
+    parser.add_argument(
+        '--clear-link-cache', action='store_true',
+        help='清空链接密文缓存（更换密钥后会自动失效，一般不需要）',
+    )
+    parser.add_argument(
+        '--hash-images', action='store_true',
+        help='同步图片时比较内容哈希，而不只是大小和修改时间',
+    )
+    parser.add_argument(
+        '--link-mode', choices=LINK_MODES, default='copy',
+        help='图片同步方式：copy（默认）、hardlink 或 reflink，不支持时自动退回复制',
+    )
+    parser.add_argument(
+        '--optimize-images', action='store_true',
+        help='额外生成限宽 WebP 和响应式宽度版本（需要 Pillow，结果会缓存）',
+    )
+    parser.add_argument(
+        '--stdin', action='store_true',
+        help='从标准输入读取markdown并把结果写到标准输出（与 -z 一起使用时为批量模式）',
+    )
+    parser.add_argument(
+        '--stdin-path', default='',
+        help='标准输入对应的文章路径（相对于项目根目录），用于白名单判断',
+    )
+    parser.add_argument(
+        '--stdout', action='store_true',
+        help='把指定文件的转换结果写到标准输出，不修改文件',
+    )
+    parser.add_argument(
+        '-z', '--null', action='store_true',
+        help='过滤模式下输入输出都使用 路径\\0文本\\0 记录，一个进程处理任意多篇文章',
+    )
+    parser.add_argument(
+        '--dedupe-images', action='store_true',
+        help='图片按内容哈希去重输出到 public/assets/images，并写出地址映射 public/image-map.json'
+             '（不再复制到 public/src/posts，前端需要通过映射或图片清单中的 asset 字段取图）',
+    )
+    parser.add_argument(
+        '--password-file',
+        help=f'从文件读取加密密码（默认读取环境变量 {PASSWORD_ENV}，都没有时使用内置密码）',
+    )
+    parser.add_argument(
+        '--watch', action='store_true',
+        help='完成构建后继续监视 src/posts，只重新处理修改过的文件（有 watchdog 时使用 inotify，否则轮询）',
+    )
+    parser.add_argument(
+        '--index-by-year', action='store_true',
+        help='文章索引额外按年份分片输出（public/post-index/<年份>.json.gz）',
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error('--jobs must be >= 0')
+    return args
+
+def main(argv=None):
     """主函数，按顺序执行所有处理步骤"""
+    global QUIET
+    args = parse_args(argv)
+    root = Path(args.root).resolve()
+    QUIET = args.quiet
+    if args.stdin or args.stdout:
+        return run_filter(args, root)
+    report = new_report()
+    build_start = time.perf_counter()
     print("Starting build process...")
     
+    if args.clear_link_cache and (root / LINK_CACHE_FILE).exists():
+        print("Clearing link cache...")
+        (root / LINK_CACHE_FILE).unlink()
+    
+    # 密钥只派生一次，监视模式下一直复用
+    try:
+        password = read_password(args.password_file)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    with timed_stage(report, 'key_derivation'):
+        key = generate_key(password)
+    
     # 1. 处理 Markdown 文件加密
     print("\nProcessing markdown files...")
-    process_source_markdown()
+    try:
+        stats = process_source_markdown(root, args.paths, args.jobs, report, key)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
     
-    # 2. 处理图片复制
+    # 2. 生成文章列表页使用的索引和全文搜索索引
+    print("\nBuilding post index...")
+    build_post_index(root, args.index_by_year, report)
+    print("\nBuilding search index...")
+    build_search_index(root, report)
+    
+    # 3. 处理图片复制
     print("\nCopying images...")
-    copy_images()
+    copy_images(root, args.hash_images, args.link_mode, args.optimize_images, args.jobs, report, args.dedupe_images)
+    
+    finish_report(report, time.perf_counter() - build_start)
+    if args.report:
+        save_manifest(report, Path(args.report))
+        print(f"Build report written to {args.report}")
     
-    print("\nBuild process completed successfully!")
+    if stats['failed']:
+        print(f"\nBuild process finished with {stats['failed']} failed file(s)")
+        if not args.watch:
+            return 1
+    else:
+        print("\nBuild process completed successfully!")
+    if args.watch:
+        watch(root, key, args)
+    return 0
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import os
+import re
+import sys
+import time
+import base64
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import process_build
+
+# 更换文章链接的加密密码：用旧密钥解密每个 encrypted: 密文，再用新密钥加密
+# 已经是新密钥的密文保持不变，中断后重新运行即可继续
+
+OLD_PASSWORD_ENV = 'BLOG_OLD_PASSWORD'
+NEW_PASSWORD_ENV = 'BLOG_NEW_PASSWORD'
+# 直接在字节上匹配，不改变文件的编码和换行符
+TOKEN_RE = re.compile(rb'\]\(encrypted:([A-Za-z0-9_\-]+=*)\)')
+TOKEN_MARKER = b'](encrypted:'
+# 每处理多少个文件输出一次进度
+PROGRESS_EVERY = 100
+
+def decrypt_token(token: bytes, aesgcm: AESGCM):
+    """解密一个密文，密钥不匹配或密文损坏时返回 None"""
+    try:
+        data = base64.urlsafe_b64decode(token)
+        return aesgcm.decrypt(data[:12], data[12:], None).decode('utf-8')
+    except (ValueError, InvalidTag):
+        return None
+
+def rekey_file(path: Path, old_key: bytes, new_key: bytes, link_cache=None, dry_run: bool = False) -> dict:
+    """重新加密单个文件中的所有密文，返回统计和新生成的 {链接: 密文}"""
+    raw = path.read_bytes()
+    result = {'tokens': 0, 'rekeyed': 0, 'current': 0, 'failed': 0, 'links': {}}
+    if TOKEN_MARKER not in raw:
+        result['status'] = 'no_tokens'
+        return result
+    
+    old_aes = AESGCM(old_key)
+    new_aes = AESGCM(new_key)
+    links = result['links']
+    
+    def replace(match):
+        result['tokens'] += 1
+        url = decrypt_token(match.group(1), old_aes)
+        if url is None:
+            # 上次运行已经换成新密钥的密文
+            if decrypt_token(match.group(1), new_aes) is not None:
+                result['current'] += 1
+            else:
+                result['failed'] += 1
+            return match.group(0)
+        result['rekeyed'] += 1
+        encrypted = links.get(url) or (link_cache or {}).get(url)
+        if encrypted is None:
+            encrypted = links[url] = process_build.encrypt_url(url, new_key)
+        return b'](encrypted:' + encrypted.encode() + b')'
+    
+    output = TOKEN_RE.sub(replace, raw)
+    if not result['rekeyed']:
+        result['status'] = 'failed' if result['failed'] else 'current'
+        return result
+    if not dry_run:
+        # 先写临时文件再替换，中断时不会留下写了一半的文章
+        tmp_path = path.with_name(f'.{path.name}.rekey.tmp')
+        tmp_path.write_bytes(output)
+        os.replace(tmp_path, path)
+    result['status'] = 'rekeyed'
+    result['hash'] = process_build.file_hash(output)
+    return result
+
+# 工作进程中共享的密钥和链接缓存，由 _init_worker 在进程启动时设置一次
+_worker_args = None
+
+def _init_worker(old_key: bytes, new_key: bytes, link_cache, dry_run: bool):
+    global _worker_args
+    _worker_args = (old_key, new_key, link_cache, dry_run)
+
+def _run_worker_task(path: str) -> dict:
+    """进程池任务：异常转换为错误结果，由主进程统一报告"""
+    try:
+        return rekey_file(Path(path), *_worker_args)
+    except Exception as e:
+        return {'status': 'error', 'error': f'{type(e).__name__}: {e}', 'links': {}}
+
+def rekey_posts(root: Path, old_key: bytes, new_key: bytes, jobs: int = 1, dry_run: bool = False) -> dict:
+    """在进程池中重新加密整个文章目录，并更新构建清单和链接密文缓存"""
+    root = Path(root).resolve()
+    src_dir = root / process_build.SRC_POSTS_DIR
+    link_cache_file = root / process_build.LINK_CACHE_FILE
+    manifest_file = root / process_build.MANIFEST_FILE
+    link_cache = process_build.load_link_cache(new_key, link_cache_file)
+    cached_links = len(link_cache)
+    manifest = process_build.load_manifest(manifest_file)
+    
+    files = process_build.collect_markdown_files(root)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(files)))
+    stats = {'files': len(files), 'rekeyed': 0, 'current': 0, 'no_tokens': 0, 'failed': 0, 'error': 0,
+             'tokens_rekeyed': 0, 'tokens_failed': 0}
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(old_key, new_key, link_cache, dry_run)) as executor:
+        results = executor.map(_run_worker_task, [str(path) for path in files],
+                               chunksize=max(1, len(files) // (jobs * 4)))
+        for done, (path, result) in enumerate(zip(files, results), 1):
+            rel_name = path.relative_to(src_dir).as_posix()
+            stats[result['status']] += 1
+            stats['tokens_rekeyed'] += result.get('rekeyed', 0)
+            stats['tokens_failed'] += result.get('failed', 0)
+            if result['status'] == 'error':
+                print(f"Error re-keying {rel_name}: {result['error']}")
+            elif result.get('failed'):
+                print(f"Could not decrypt {result['failed']} token(s) in {rel_name} with either key")
+            if result['status'] == 'rekeyed':
+                process_build.log_detail(f"Re-keyed {result['rekeyed']} token(s) in {rel_name}")
+                for url, encrypted in result['links'].items():
+                    link_cache.setdefault(url, encrypted)
+                # 清单中的记录改为新内容的哈希，下次构建仍然可以跳过这个文件
+                entry = manifest['files'].get(rel_name)
+                if entry is not None:
+                    entry['hash'] = result['hash']
+            if done % PROGRESS_EVERY == 0 or done == len(files):
+                print(f"[{done}/{len(files)}] {stats['rekeyed']} file(s) re-keyed, "
+                      f"{time.perf_counter() - start:.1f}s")
+    
+    if not dry_run:
+        process_build.save_manifest(manifest, manifest_file)
+        if len(link_cache) != cached_links:
+            process_build.save_link_cache(link_cache, new_key, link_cache_file)
+    return stats
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description='更换文章链接的加密密码（密码不通过命令行参数传递，避免出现在进程列表中）'
+    )
+    parser.add_argument('--root', default='.', help='项目根目录（默认为当前目录）')
+    parser.add_argument(
+        '--old-password-file',
+        help=f'旧密码文件（默认读取环境变量 {OLD_PASSWORD_ENV}，'
+             f'都没有时使用当前构建密码 {process_build.PASSWORD_ENV} / 内置密码）',
+    )
+    parser.add_argument(
+        '--new-password-file',
+        help=f'新密码文件（默认读取环境变量 {NEW_PASSWORD_ENV}）',
+    )
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数，0 表示使用全部CPU核心（默认 0）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不输出逐文件的信息')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不修改文件')
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error('--jobs must be >= 0')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    process_build.QUIET = args.quiet
+    try:
+        old_password = process_build.read_password(
+            args.old_password_file, OLD_PASSWORD_ENV, process_build.read_password()
+        )
+        new_password = process_build.read_password(args.new_password_file, NEW_PASSWORD_ENV, None)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    if not new_password:
+        print(f"Error: set {NEW_PASSWORD_ENV} or pass --new-password-file")
+        return 2
+    if new_password == old_password:
+        print("Error: the new password is the same as the old one")
+        return 2
+    
+    old_key = process_build.generate_key(old_password)
+    new_key = process_build.generate_key(new_password)
+    stats = rekey_posts(Path(args.root), old_key, new_key, args.jobs, args.dry_run)
+    print(
+        f"Re-key summary: {stats['rekeyed']} file(s) re-keyed ({stats['tokens_rekeyed']} tokens), "
+        f"{stats['current']} already current, {stats['no_tokens']} without tokens, "
+        f"{stats['failed'] + stats['error']} failed"
+    )
+    if args.dry_run:
+        print("Dry run: no files were changed")
+    elif stats['rekeyed']:
+        print(f"Remember to build with the new password ({process_build.PASSWORD_ENV} or --password-file)")
+    return 1 if stats['failed'] or stats['error'] or stats['tokens_failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
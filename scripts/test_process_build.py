@@ -0,0 +1,100 @@
+"""process_build 链接加密的回归测试（python -m pytest scripts）
+
+期望输出由原来基于 re.sub 的实现生成，保存在 testdata/markdown_links.json 中。
+encrypt_url 替换为确定性的桩函数，输出不受随机 nonce 影响。
+"""
+import re
+import json
+import time
+import random
+import hashlib
+from pathlib import Path
+
+import pytest
+
+import process_build
+
+DATA_FILE = Path(__file__).parent / 'testdata' / 'markdown_links.json'
+# 病态输入的处理时间上限（秒），原实现在这些输入上需要 5~20 秒
+PATHOLOGICAL_TIME_LIMIT = 0.5
+PATHOLOGICAL_SIZE = 20000
+FUZZ_SEED = 20261017
+FUZZ_DOCUMENTS = 500
+FUZZ_TOKENS = [
+    '[', ']', '(', ')', '](', '.', ' ', '\n', 'x', '中文', '提取码：', '提取码:', 'ab12', 'abcd12',
+    'http://a.io/p', 'https://b.com/q?x=1', 'magnet:?xt=urn:1', 'pic.png', 'encrypted:zz', 'docs/a.md',
+]
+KEY = b'\0' * 32
+
+# 生成病态输入，期望输出只保存长度和哈希
+PATHOLOGICAL_INPUTS = {
+    'unclosed_brackets': lambda n: '[' * n,
+    'unclosed_link_targets': lambda n: '[a](' * (n // 4),
+    'bracket_runs': lambda n: '[x]' * (n // 3),
+    'cjk_lines_without_dots': lambda n: ('中文' * (n // 2) + '\n') * 3,
+    'cjk_line_with_url': lambda n: '中文' * (n // 2) + ' https://example.com/a 提取码：abcd',
+    'http_prefix_run': lambda n: 'http:' * (n // 5),
+}
+
+def stub_encrypt_url(url: str, key: bytes) -> str:
+    return 'stub-' + hashlib.sha256(url.encode()).hexdigest()[:16]
+
+def reference_process_markdown_content(content: str) -> str:
+    """原来的两遍 re.sub 实现，作为差分测试的基准（只用于短输入，长输入上会回溯）"""
+    def encrypted(url, extract_code):
+        if extract_code:
+            return f'[🔒 加密链接点击解密 提取码：{extract_code}](encrypted:{stub_encrypt_url(url, KEY)})'
+        return f'[🔒 加密链接点击解密](encrypted:{stub_encrypt_url(url, KEY)})'
+
+    def encrypt_link(match):
+        text, url = match.group(1), match.group(2)
+        if url.endswith(('.webp', '.jpg', '.jpeg', '.png', '.gif', '.svg')) or url.startswith('encrypted:'):
+            return match.group(0)
+        if url.startswith(('http://', 'https://', 'magnet:')):
+            extract_code_match = re.search(r'提取码[：:]\s*([A-Za-z0-9]{4,6})', text)
+            return encrypted(url, extract_code_match.group(1) if extract_code_match else None)
+        return match.group(0)
+
+    def process_url_with_code(match):
+        full_text = match.group(0)
+        extract_code_match = re.search(r'提取码[：:]\s*([A-Za-z0-9]{4,6})', full_text)
+        extract_code = extract_code_match.group(1) if extract_code_match else None
+        return re.sub(r'(https?://[^\s提取码]+|magnet:\?[^\s提取码]+)',
+                      lambda url_match: encrypted(url_match.group(1), extract_code), full_text)
+
+    content = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', encrypt_link, content)
+    url_block_pattern = r'[^\n.]*(https?://[^\s]+|magnet:\?[^\s]+)[^\n]*(?:提取码[：:]\s*[A-Za-z0-9]{4,6})?'
+    return re.sub(url_block_pattern, process_url_with_code, content)
+
+def digest(text: str) -> dict:
+    return {'length': len(text), 'sha256': hashlib.sha256(text.encode('utf-8')).hexdigest()}
+
+def load_expected() -> dict:
+    with open(DATA_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+EXPECTED = load_expected()
+
+@pytest.fixture(autouse=True)
+def deterministic_encryption(monkeypatch):
+    monkeypatch.setattr(process_build, 'encrypt_url', stub_encrypt_url)
+
+@pytest.mark.parametrize('name', sorted(EXPECTED['cases']))
+def test_matches_saved_output(name):
+    case = EXPECTED['cases'][name]
+    assert process_build.process_markdown_content(case['input'], KEY) == case['expected']
+
+@pytest.mark.parametrize('name', sorted(PATHOLOGICAL_INPUTS))
+def test_pathological_input(name):
+    text = PATHOLOGICAL_INPUTS[name](PATHOLOGICAL_SIZE)
+    started = time.perf_counter()
+    output = process_build.process_markdown_content(text, KEY)
+    elapsed = time.perf_counter() - started
+    assert digest(output) == EXPECTED['pathological'][name]
+    assert elapsed < PATHOLOGICAL_TIME_LIMIT, f'{name} took {elapsed:.3f}s'
+
+def test_matches_reference_on_random_documents():
+    rng = random.Random(FUZZ_SEED)
+    for _ in range(FUZZ_DOCUMENTS):
+        text = ''.join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(0, 40)))
+        assert process_build.process_markdown_content(text, KEY) == reference_process_markdown_content(text), text